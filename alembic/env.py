@@ -13,10 +13,16 @@ if config.config_file_name is not None:
 from apps.core.models import FastModel
 from apps.accounts.models import FastModel
 from apps.logwriter.models import FastModel
+from apps.logwriter.partitions import is_partition
 
 target_metadata = FastModel.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # partitions of log_entries are created and dropped at runtime by apps.logwriter.partitions
+    return not (type_ == "table" and reflected and is_partition(name))
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
@@ -31,6 +37,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
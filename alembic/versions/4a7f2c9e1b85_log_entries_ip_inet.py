@@ -0,0 +1,49 @@
+"""log_entries ip inet
+
+Revision ID: 4a7f2c9e1b85
+Revises: 1e6c0b8d4a97
+Create Date: 2026-10-18 17:12:55.931640
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7f2c9e1b85'
+down_revision: Union[str, None] = '1e6c0b8d4a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # values that are not addresses (host names logged with HostnameLookups, garbage) cannot be cast:
+    # they are kept in host and ip becomes NULL; ix_log_entries_ip is rebuilt for the new type
+    op.add_column('log_entries', sa.Column('host', sa.String(), nullable=True))
+    op.execute(
+        "CREATE FUNCTION pg_temp.to_inet(value varchar) RETURNS inet AS $$ "
+        "BEGIN RETURN value::inet; EXCEPTION WHEN invalid_text_representation THEN RETURN NULL; END "
+        "$$ LANGUAGE plpgsql IMMUTABLE"
+    )
+    moved = op.get_bind().execute(sa.text(
+        "UPDATE log_entries SET host = ip WHERE ip IS NOT NULL AND pg_temp.to_inet(ip) IS NULL"
+    )).rowcount
+    if moved:
+        logging.getLogger("alembic").info(f"Moved {moved} log_entries.ip values that are not addresses to host")
+    op.alter_column('log_entries', 'ip',
+               existing_type=sa.VARCHAR(),
+               type_=postgresql.INET(),
+               existing_nullable=True,
+               postgresql_using='pg_temp.to_inet(ip)')
+
+
+def downgrade() -> None:
+    op.alter_column('log_entries', 'ip',
+               existing_type=postgresql.INET(),
+               type_=sa.VARCHAR(),
+               existing_nullable=True,
+               postgresql_using='COALESCE(host(ip), host)')
+    op.drop_column('log_entries', 'host')
@@ -0,0 +1,35 @@
+"""log_entries.date as timestamptz
+
+Revision ID: 5f1a9d3c7e24
+Revises: 9c4d2a7e5b10
+Create Date: 2026-10-18 13:05:52.640915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1a9d3c7e24'
+down_revision: Union[str, None] = '9c4d2a7e5b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing rows were stored without their offset; they are read in the server's TimeZone setting
+    op.alter_column('log_entries', 'date',
+               existing_type=sa.DateTime(),
+               type_=sa.DateTime(timezone=True),
+               existing_nullable=True,
+               existing_server_default=sa.text('now()'))
+
+
+def downgrade() -> None:
+    op.alter_column('log_entries', 'date',
+               existing_type=sa.DateTime(timezone=True),
+               type_=sa.DateTime(),
+               existing_nullable=True,
+               existing_server_default=sa.text('now()'))
@@ -0,0 +1,100 @@
+"""partition log_entries by day
+
+Revision ID: b81d6f0c3e47
+Revises: 4a7f2c9e1b85
+Create Date: 2026-10-18 18:03:19.640215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81d6f0c3e47'
+down_revision: Union[str, None] = '4a7f2c9e1b85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = 'id, ip, host, date, request_id, referer_id, user_agent_id, status, size'
+
+
+def _create_log_entries(id_type, primary_key, date_nullable, **kwargs):
+    op.create_table('log_entries',
+    sa.Column('id', id_type, server_default=sa.text("nextval('log_entries_id_seq'::regclass)"), nullable=False),
+    sa.Column('ip', postgresql.INET(), nullable=True),
+    sa.Column('host', sa.String(), nullable=True),
+    sa.Column('date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=date_nullable),
+    sa.Column('request_id', sa.Integer(), nullable=True),
+    sa.Column('referer_id', sa.Integer(), nullable=True),
+    sa.Column('user_agent_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['referer_id'], ['log_referers.id'], ),
+    sa.ForeignKeyConstraint(['request_id'], ['log_requests.id'], ),
+    sa.ForeignKeyConstraint(['user_agent_id'], ['log_user_agents.id'], ),
+    primary_key,
+    **kwargs
+    )
+    # the sequence must follow the new table, or it is dropped with the old one
+    op.execute('ALTER SEQUENCE log_entries_id_seq OWNED BY log_entries.id')
+
+
+def _create_indexes():
+    op.create_index(op.f('ix_log_entries_date'), 'log_entries', ['date'], unique=False)
+    op.create_index(op.f('ix_log_entries_ip'), 'log_entries', ['ip'], unique=False)
+    op.create_index(op.f('ix_log_entries_request_id'), 'log_entries', ['request_id'], unique=False)
+
+
+def _drop_indexes():
+    op.drop_index(op.f('ix_log_entries_request_id'), table_name='log_entries')
+    op.drop_index(op.f('ix_log_entries_ip'), table_name='log_entries')
+    op.drop_index(op.f('ix_log_entries_date'), table_name='log_entries')
+
+
+def upgrade() -> None:
+    _drop_indexes()
+    op.rename_table('log_entries', 'log_entries_unpartitioned')
+    op.execute('ALTER TABLE log_entries_unpartitioned RENAME CONSTRAINT log_entries_pkey TO log_entries_unpartitioned_pkey')
+
+    # the partition key must be part of the primary key; the ids outgrow int4, so they become bigserial
+    op.execute('ALTER SEQUENCE log_entries_id_seq AS bigint')
+    _create_log_entries(sa.BigInteger(), sa.PrimaryKeyConstraint('id', 'date'), False,
+                        postgresql_partition_by='RANGE (date)')
+    op.execute('CREATE TABLE log_entries_default PARTITION OF log_entries DEFAULT')
+    # one partition per UTC day from the oldest entry to a week ahead, named like apps.logwriter.partitions does
+    op.execute("""
+        DO $$
+        DECLARE day timestamp;
+        BEGIN
+            FOR day IN SELECT generate_series(
+                date_trunc('day', COALESCE((SELECT min(date) FROM log_entries_unpartitioned), now()) AT TIME ZONE 'UTC'),
+                date_trunc('day', GREATEST((SELECT max(date) FROM log_entries_unpartitioned), now()) AT TIME ZONE 'UTC')
+                    + interval '7 days',
+                interval '1 day')
+            LOOP
+                EXECUTE format('CREATE TABLE log_entries_p%s PARTITION OF log_entries FOR VALUES FROM (%L) TO (%L)',
+                               to_char(day, 'YYYYMMDD'), day || '+00', (day + interval '1 day') || '+00');
+            END LOOP;
+        END $$
+    """)
+    op.execute(
+        f"INSERT INTO log_entries ({COLUMNS}) "
+        f"SELECT {COLUMNS.replace('date', 'COALESCE(date, now())')} FROM log_entries_unpartitioned"
+    )
+    op.drop_table('log_entries_unpartitioned')
+    _create_indexes()
+
+
+def downgrade() -> None:
+    _drop_indexes()
+    op.rename_table('log_entries', 'log_entries_partitioned')
+    op.execute('ALTER TABLE log_entries_partitioned RENAME CONSTRAINT log_entries_pkey TO log_entries_partitioned_pkey')
+    # fails if an id no longer fits in int4
+    op.execute('ALTER SEQUENCE log_entries_id_seq AS integer')
+    _create_log_entries(sa.Integer(), sa.PrimaryKeyConstraint('id'), True)
+    op.execute(f"INSERT INTO log_entries ({COLUMNS}) SELECT {COLUMNS} FROM log_entries_partitioned")
+    # drops the partitions too
+    op.drop_table('log_entries_partitioned')
+    _create_indexes()
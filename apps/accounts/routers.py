@@ -5,6 +5,7 @@ from apps.accounts import schemas
 from apps.accounts.services.authenticate import AccountService
 from apps.accounts.services.permissions import Permission
 from apps.accounts.services.user import User, UserManager
+from config.database import DatabaseManager, SessionRunner
 
 router = APIRouter(
     prefix='/accounts'
@@ -36,8 +37,9 @@ router = APIRouter(
 Обратите внимание, что пользователи не смогут войти в свои учетные записи до тех пор, пока их адреса электронной почты не будут подтверждены.
 """,
     tags=['Авторизация'])
-async def register(payload: schemas.RegisterIn = Body(**schemas.RegisterIn.examples())):
-    return AccountService.register(**payload.model_dump(exclude={"password_confirm"}))
+async def register(payload: schemas.RegisterIn = Body(**schemas.RegisterIn.examples()),
+                   db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(lambda _: AccountService.register(**payload.model_dump(exclude={"password_confirm"})))
 
 
 @router.patch(
@@ -47,8 +49,8 @@ async def register(payload: schemas.RegisterIn = Body(**schemas.RegisterIn.examp
     summary='Проверка регистрации пользователей',
     description='Проверьте регистрацию нового пользователя, подтвердив предоставленный OTP.',
     tags=['Авторизация'])
-async def verify_registration(payload: schemas.RegisterVerifyIn):
-    return AccountService.verify_registration(**payload.model_dump())
+async def verify_registration(payload: schemas.RegisterVerifyIn, db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(lambda _: AccountService.verify_registration(**payload.model_dump()))
 
 
 # ---------------------
@@ -63,8 +65,8 @@ async def verify_registration(payload: schemas.RegisterVerifyIn):
     summary='Вход в систему для пользователя',
     description='Вход в систему пользователя с действительными учетными данными, если учетная запись пользователя активна.',
     tags=['Авторизация'])
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    return AccountService.login(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(lambda _: AccountService.login(form_data.username, form_data.password))
 
 
 @router.post(
@@ -74,8 +76,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     description="Выход из системы текущего аутентифицированного пользователя. "
                 "Отзывает маркер доступа пользователя и аннулирует сессию.",
     tags=['Авторизация'])
-async def logout(current_user: User = Depends(AccountService.current_user)):
-    AccountService.logout(current_user)
+async def logout(current_user: User = Depends(AccountService.current_user), db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    await db.run(lambda _: AccountService.logout(current_user))
 
 
 # ------------------------
@@ -91,8 +93,8 @@ async def logout(current_user: User = Depends(AccountService.current_user)):
     description="Инициируйте запрос на сброс пароля, отправив письмо с подтверждением на пользовательский адрес "
                 "зарегистрированный адрес электронной почты.",
     tags=['Авторизация'])
-async def reset_password(payload: schemas.PasswordResetIn):
-    return AccountService.reset_password(**payload.model_dump())
+async def reset_password(payload: schemas.PasswordResetIn, db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(lambda _: AccountService.reset_password(**payload.model_dump()))
 
 
 @router.patch(
@@ -103,8 +105,10 @@ async def reset_password(payload: schemas.PasswordResetIn):
     description="Проверьте запрос на сброс пароля, подтвердив предоставленный OTP, отправленный на пользовательский номер "
                 "зарегистрированный адрес электронной почты. Если изменение прошло успешно, пользователю нужно будет снова войти в систему.",
     tags=['Авторизация'])
-async def verify_reset_password(payload: schemas.PasswordResetVerifyIn):
-    return AccountService.verify_reset_password(**payload.model_dump(exclude={"password_confirm"}))
+async def verify_reset_password(payload: schemas.PasswordResetVerifyIn, db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(
+        lambda _: AccountService.verify_reset_password(**payload.model_dump(exclude={"password_confirm"}))
+    )
 
 
 # -------------------
@@ -125,8 +129,9 @@ async def verify_reset_password(payload: schemas.PasswordResetVerifyIn):
     """,
 
     tags=['Авторизация'])
-async def resend_otp(payload: schemas.OTPResendIn = Body(**schemas.OTPResendIn.examples())):
-    AccountService.resend_otp(**payload.model_dump())
+async def resend_otp(payload: schemas.OTPResendIn = Body(**schemas.OTPResendIn.examples()),
+                     db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    await db.run(lambda _: AccountService.resend_otp(**payload.model_dump()))
 
 
 # ---------------------
@@ -152,8 +157,9 @@ async def retrieve_me(current_user: User = Depends(AccountService.current_user))
     summary='Обновление текущего пользователя',
     description='Обновление текущего пользователя.',
     tags=['Пользователи'])
-async def update_me(payload: schemas.UpdateUserSchema, current_user: User = Depends(AccountService.current_user)):
-    user = UserManager.update_user(current_user.id, **payload.model_dump())
+async def update_me(payload: schemas.UpdateUserSchema, current_user: User = Depends(AccountService.current_user),
+                    db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    user = await db.run(lambda _: UserManager.update_user(current_user.id, **payload.model_dump()))
     return {'user': UserManager.to_dict(user)}
 
 
@@ -166,8 +172,11 @@ async def update_me(payload: schemas.UpdateUserSchema, current_user: User = Depe
                 'нужно снова войти в систему.',
     tags=['Пользователи'])
 async def change_password(payload: schemas.PasswordChangeIn = Body(**schemas.PasswordChangeIn.examples()),
-                          current_user: User = Depends(AccountService.current_user)):
-    return AccountService.change_password(current_user, **payload.model_dump(exclude={"password_confirm"}))
+                          current_user: User = Depends(AccountService.current_user),
+                          db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(
+        lambda _: AccountService.change_password(current_user, **payload.model_dump(exclude={"password_confirm"}))
+    )
 
 
 @router.post(
@@ -180,8 +189,9 @@ async def change_password(payload: schemas.PasswordChangeIn = Body(**schemas.Pas
 После установки нового адреса электронной почты на него будет отправлен OTP-код для проверки.
 """,
     tags=['Пользователи'])
-async def change_email(email: schemas.EmailChangeIn, current_user: User = Depends(AccountService.current_user)):
-    return AccountService.change_email(current_user, **email.model_dump())
+async def change_email(email: schemas.EmailChangeIn, current_user: User = Depends(AccountService.current_user),
+                       db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(lambda _: AccountService.change_email(current_user, **email.model_dump()))
 
 
 @router.patch(
@@ -196,8 +206,9 @@ async def change_email(email: schemas.EmailChangeIn, current_user: User = Depend
 """,
     tags=['Пользователи'])
 async def verify_change_email(otp: schemas.EmailChangeVerifyIn,
-                              current_user: User = Depends(AccountService.current_user)):
-    return AccountService.verify_change_email(current_user, **otp.model_dump())
+                              current_user: User = Depends(AccountService.current_user),
+                              db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return await db.run(lambda _: AccountService.verify_change_email(current_user, **otp.model_dump()))
 
 
 @router.get(
@@ -209,8 +220,8 @@ async def verify_change_email(otp: schemas.EmailChangeVerifyIn,
     tags=['Пользователи'],
     dependencies=[Depends(Permission.is_admin)]
 )
-async def retrieve_user(user_id: int):
-    return {'user': UserManager.to_dict(UserManager.get_user(user_id))}
+async def retrieve_user(user_id: int, db: SessionRunner = Depends(DatabaseManager.get_runner)):
+    return {'user': UserManager.to_dict(await db.run(lambda _: UserManager.get_user(user_id)))}
 
 # TODO DELETE /accounts/me
 # TODO add docs and examples to endpoints
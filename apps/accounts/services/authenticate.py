@@ -7,15 +7,17 @@ from apps.accounts.services.token import TokenService
 from apps.accounts.services.user import UserManager
 from apps.core.date_time import DateTime
 from apps.core.services.email_manager import EmailService
+from config.database import DatabaseManager, SessionRunner
 
 
 class AccountService:
 
     @classmethod
     async def current_user(
-        cls, token: str = Depends(OAuth2PasswordBearer(tokenUrl="accounts/login"))
+        cls, token: str = Depends(OAuth2PasswordBearer(tokenUrl="accounts/login")),
+        db: SessionRunner = Depends(DatabaseManager.get_runner)
     ) -> User:
-        user = await TokenService.fetch_user(token)
+        user = await TokenService.fetch_user(token, db)
         return user
 
     # ----------------
@@ -4,6 +4,8 @@ from fastapi import HTTPException
 from passlib.context import CryptContext
 from starlette import status
 
+from config.database import run_blocking
+
 
 class PasswordManager:
     password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -69,8 +71,8 @@ class PasswordManager:
 
     @classmethod
     def hash_password(cls, password: str):
-        return cls.password_context.hash(password)
+        return run_blocking(cls.password_context.hash, password)
 
     @classmethod
     def verify_password(cls, plain_password: str, hashed_password: str):
-        return cls.password_context.verify(plain_password, hashed_password)
+        return run_blocking(cls.password_context.verify, plain_password, hashed_password)
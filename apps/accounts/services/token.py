@@ -8,6 +8,7 @@ from pyotp import TOTP
 
 from apps.accounts.models import User, UserVerification
 from apps.accounts.services.user import UserManager
+from config.database import SessionRunner
 from config.settings import AppConfig
 
 
@@ -96,12 +97,13 @@ class TokenService:
         )
 
     @classmethod
-    async def fetch_user(cls, token: str) -> User:
+    async def fetch_user(cls, token: str, db: SessionRunner) -> User:
         """
         Retrieve the user associated with the provided JWT token.
 
         Args:
             token (str): JWT token.
+            db (SessionRunner): Runs the lookups in the session of the request.
 
         Returns:
             User: User object if the token is valid, raises HTTPException if not.
@@ -122,24 +124,27 @@ class TokenService:
 
         # --- get user ---
         # TODO move user data to token and dont fetch them from database
-        user = UserManager.get_user(user_id)
+        user, active_access_token = await db.run(cls._user_and_access_token, user_id)
         if user is None:
             raise cls.credentials_exception
 
         UserManager.is_active(user)
 
         # --- validate access token ---
-        active_access_token = (
-            UserVerification.filter(UserVerification.user_id == user_id)
-            .first()
-            .active_access_token
-        )
         if token != active_access_token:
             raise cls.credentials_exception
 
         UserManager.is_active(user)
         return user
 
+    @staticmethod
+    def _user_and_access_token(session, user_id: int) -> tuple[User | None, str | None]:
+        user = UserManager.get_user(user_id)
+        if user is None:
+            return None, None
+        verification = UserVerification.filter(UserVerification.user_id == user_id).first()
+        return user, verification.active_access_token
+
     # -----------------
     # --- OTP Token ---
     # -----------------
@@ -5,6 +5,7 @@ from email.mime.text import MIMEText
 from pytest_is_running import is_running
 
 from apps.accounts.services.token import TokenService
+from config.database import run_blocking
 from config.settings import EmailServiceConfig, AppConfig
 
 
@@ -44,7 +45,7 @@ class EmailService:
         if is_running() or cls.config.use_local_fallback:
             cls.__print_test_otp(TokenService.create_otp_token())
         else:
-            cls.__send_email(subject, body, to_address)
+            run_blocking(cls.__send_email, subject, body, to_address)
 
     @classmethod
     def register_send_verification_email(cls, to_address):
@@ -0,0 +1,197 @@
+import ipaddress
+import itertools
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogEntry, LogReferer, LogRequest, LogUserAgent
+from apps.logwriter.partitions import PARENT, LogPartitions, period_end, period_start
+
+# archived entries keep their values rather than dimension ids, so a file is readable on its own
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("ip", pa.string()),
+    ("date", pa.timestamp("us", tz="UTC")),
+    ("request", pa.string()),
+    ("referer", pa.string()),
+    ("user_agent", pa.string()),
+    ("status", pa.int32()),
+    ("size", pa.int64()),
+    # added later, older files read back as None
+    ("host", pa.string()),
+])
+
+# rows per Parquet row group; each group keeps min/max statistics of its (sorted) dates
+ROW_GROUP_ROWS = 100_000
+
+# log_entries_20240101_20240102.parquet, then -1, -2, ... for rows of the period archived later
+_FILE_RE = re.compile(rf"{PARENT}_(\d{{8}})_(\d{{8}})(-\d+)?\.parquet")
+
+
+@dataclass
+class ArchivedLogEntry:
+    """
+    A log entry read back from the archive, with the attributes of `LogEntry` that queries return.
+    """
+
+    id: int
+    ip: Optional[str]
+    date: datetime
+    request: Optional[str]
+    referer: Optional[str]
+    user_agent: Optional[str]
+    status: Optional[int]
+    size: Optional[int]
+    host: Optional[str]
+
+
+def _utc(moment: datetime) -> datetime:
+    # naive timestamps, as returned by SQLite or parsed from a dd.mm.yyyy date, are taken as UTC
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+def archive_files(directory: str) -> list[tuple[str, datetime, datetime]]:
+    """
+    Return the archive files of `directory` as ``(path, start, end)``, oldest first.
+    """
+
+    if not directory or not os.path.isdir(directory):
+        return []
+    files = []
+    for filename in os.listdir(directory):
+        match = _FILE_RE.fullmatch(filename)
+        if match:
+            start, end = (
+                datetime.strptime(value, "%Y%m%d").replace(tzinfo=timezone.utc) for value in match.group(1, 2)
+            )
+            files.append((os.path.join(directory, filename), start, end))
+    return sorted(files, key=lambda file: (file[1], len(file[0]), file[0]))
+
+
+def export_period(db: Session, directory: str, start: datetime, end: datetime) -> Optional[str]:
+    """
+    Write the log entries of ``[start, end)`` to a zstd-compressed Parquet file in `directory`, sorted by date.
+
+    The file is written under a temporary name and renamed once complete, so a crash never leaves a
+    truncated archive behind. Exporting a period that already has a file, such as late rows archived
+    after it, adds a part file next to it (``..._20240102-1.parquet``) instead of replacing it.
+
+    Returns:
+        The path of the file, or None when the period has no entries.
+    """
+
+    name = f"{PARENT}_{start:%Y%m%d}_{end:%Y%m%d}"
+    temporary = os.path.join(directory, f"{name}.{os.getpid()}.tmp")
+    rows = db.execute(
+        select(LogEntry.id, LogEntry.ip, LogEntry.date, LogRequest.value, LogReferer.value, LogUserAgent.value,
+               LogEntry.status, LogEntry.size, LogEntry.host)
+        .outerjoin(LogRequest, LogEntry.request_id == LogRequest.id)
+        .outerjoin(LogReferer, LogEntry.referer_id == LogReferer.id)
+        .outerjoin(LogUserAgent, LogEntry.user_agent_id == LogUserAgent.id)
+        .where(LogEntry.date >= start, LogEntry.date < end)
+        .order_by(LogEntry.date)
+        .execution_options(yield_per=ROW_GROUP_ROWS)
+    )
+    os.makedirs(directory, exist_ok=True)
+    writer = None
+    try:
+        while chunk := list(islice(rows, ROW_GROUP_ROWS)):
+            if writer is None:
+                writer = pq.ParquetWriter(temporary, SCHEMA, compression="zstd")
+            columns = zip(*chunk)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)], schema=SCHEMA
+            ))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return None
+    with open(temporary, "rb") as file:
+        os.fsync(file.fileno())
+    for part in itertools.count():
+        path = os.path.join(directory, f"{name}{f'-{part}' if part else ''}.parquet")
+        try:
+            # unlike a rename, a link fails on an existing file, also one written concurrently
+            os.link(temporary, path)
+            break
+        except FileExistsError:
+            continue
+    os.remove(temporary)
+    return path
+
+
+def archive_logs(db: Session, settings, now: datetime = None) -> list[str]:
+    """
+    Move the log entries older than `settings.archive_after_days` to Parquet files in `settings.archive_dir`,
+    one file per partition period.
+
+    On a partitioned PostgreSQL table every partition that ends before the cutoff is exported and then
+    dropped; elsewhere the entries are exported per `settings.partition_interval` period and deleted.
+    Each period is committed on its own, once its file is on disk. Traffic rollups are kept.
+
+    Returns:
+        The paths of the files written.
+    """
+
+    if not settings.archive_dir or not settings.archive_after_days:
+        return []
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=settings.archive_after_days)
+    partitions = LogPartitions(db, settings.partition_interval)
+    if partitions.enabled:
+        periods = [(start, end, name) for name, start, end in partitions.partitions() if end <= cutoff]
+    else:
+        periods = []
+        oldest = db.execute(select(func.min(LogEntry.date))).scalar()
+        start = oldest and period_start(_utc(oldest), settings.partition_interval)
+        while start and period_end(start, settings.partition_interval) <= cutoff:
+            periods.append((start, period_end(start, settings.partition_interval), None))
+            start = periods[-1][1]
+
+    archived = []
+    for start, end, name in periods:
+        path = export_period(db, settings.archive_dir, start, end)
+        if name:
+            partitions.drop(name, start)
+        else:
+            db.execute(delete(LogEntry).where(LogEntry.date >= start, LogEntry.date < end))
+        db.commit()
+        if path:
+            archived.append(path)
+    return archived
+
+
+def read_archive(directory: str, start: datetime, end: datetime, ip: str = None,
+                 status: int = None) -> list[ArchivedLogEntry]:
+    """
+    Read the archived log entries of ``[start, end)``, oldest first, optionally filtered like
+    `filter_log_entries`: by address or CIDR block and by status.
+
+    Only the files overlapping the range are opened, and within them only the row groups whose dates
+    overlap it.
+
+    Raises:
+        ValueError: If `ip` is not an address or a network.
+    """
+
+    start, end = _utc(start), _utc(end)
+    network = ipaddress.ip_network(ip, strict=False) if ip else None
+    paths = [path for path, file_start, file_end in archive_files(directory) if file_start < end and start < file_end]
+    if not paths:
+        return []
+    condition = (ds.field("date") >= start) & (ds.field("date") < end)
+    if status:
+        condition &= ds.field("status") == int(status)
+    rows = ds.dataset(paths, schema=SCHEMA, format="parquet").to_table(filter=condition).to_pylist()
+    if network:
+        rows = [row for row in rows if row["ip"] and ipaddress.ip_address(row["ip"]) in network]
+    return [ArchivedLogEntry(**row) for row in rows]
@@ -0,0 +1,189 @@
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.orm import Session
+
+from apps.logwriter.log_format import LogFormat, decode_timestamp
+from apps.logwriter.parser import parse_logs
+from apps.logwriter.reader import LogFile
+from apps.logwriter.writer import FIELDS, LogEntryWriter
+from config.database import FastModel, configure_sqlite
+from generate_logs import generate_corpus, generate_random_ip
+
+COMMON_LOG_FORMAT = '%h %l %u %t "%r" %>s %b'
+COMBINED_LOG_FORMAT = '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"'
+
+
+def _legacy_parse_line(line):
+    # the whitespace-splitting parser that predates LogFormat, kept as the baseline
+    parts = line.split()
+    ip = parts[0]
+    date = datetime.strptime(parts[3][1:], "%d/%b/%Y:%H:%M:%S")
+    request = " ".join(parts[5:8])
+    status = int(parts[8])
+    size = int(parts[9])
+    return ip, date, request, status, size
+
+
+def _corpus(num_lines: int, seed: int, requests_per_second: int) -> list[str]:
+    random.seed(seed)
+    start = datetime(2024, 1, 1)
+    requests = ["GET /index.html HTTP/1.1", "POST /form HTTP/1.1", "GET /style.css HTTP/1.1"]
+    lines = []
+    for number in range(num_lines):
+        date = start + timedelta(seconds=number // requests_per_second)
+        lines.append(
+            f'{generate_random_ip()} - - [{date.strftime("%d/%b/%Y:%H:%M:%S")} +0300] '
+            f'"{random.choice(requests)}" {random.choice([200, 404, 500])} {random.randint(200, 2000)}\n'
+        )
+    return lines
+
+
+def _lines_per_second(parse, lines) -> float:
+    started = time.perf_counter()
+    for line in lines:
+        parse(line)
+    return len(lines) / (time.perf_counter() - started)
+
+
+def bench_parser(num_lines: int = 200_000, log_format: str = COMMON_LOG_FORMAT, seed: int = 0,
+                 requests_per_second: int = 100) -> dict:
+    """
+    Compare the compiled LogFormat parser against the legacy split-based parser.
+
+    Lines are generated from a fixed seed in timestamp order, like a real access.log.
+
+    Args:
+        num_lines: Number of synthetic lines to parse.
+        log_format: The LogFormat the lines are parsed with.
+        seed: Random seed for the synthetic corpus.
+        requests_per_second: Traffic rate of the synthetic corpus.
+
+    Returns:
+        A dict with lines per second for each parser and the speedup of the compiled one.
+    """
+
+    lines = _corpus(num_lines, seed, requests_per_second)
+    compiled = LogFormat(log_format)
+
+    legacy = _lines_per_second(_legacy_parse_line, lines)
+    current = _lines_per_second(compiled.parse, lines)
+    return {
+        "lines": num_lines,
+        "legacy_lines_per_sec": round(legacy),
+        "compiled_lines_per_sec": round(current),
+        "speedup": round(current / legacy, 2),
+    }
+
+
+
+def _process_peak_rss_mb() -> float:
+    # ru_maxrss is the high-water mark since the process started, in KiB on Linux, not the peak of the last
+    # stage: a stage using less memory than an earlier one reports the earlier peak. Parser processes of
+    # the end-to-end run count as children
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / 1024, 1)
+
+
+def _measure(results: dict, stage: str, num_lines: int, num_bytes: int, run):
+    started = time.perf_counter()
+    value = run()
+    seconds = time.perf_counter() - started
+    results[stage] = {
+        "seconds": round(seconds, 3),
+        "lines_per_sec": round(num_lines / seconds),
+        "mb_per_sec": round(num_bytes / seconds / 1024 / 1024, 1),
+        "process_peak_rss_mb": _process_peak_rss_mb(),
+    }
+    return value
+
+
+def _bench_corpus(path: str, num_lines: int, seed: int, settings, database_url: str) -> dict:
+    generate_corpus(path, num_lines, seed)
+    num_bytes = os.path.getsize(path)
+    log_format = LogFormat(settings.log_format)
+    stages = {}
+
+    lines = _measure(stages, "read", num_lines, num_bytes, lambda: list(LogFile(path)))
+
+    timestamps = [line[line.index("[") + 1:line.index("]")] for line in lines]
+    decode_timestamp.cache_clear()
+    _measure(stages, "decode_timestamp", num_lines, num_bytes, lambda: list(map(decode_timestamp, timestamps)))
+    del timestamps
+
+    decode_timestamp.cache_clear()
+    rows = _measure(stages, "parse", num_lines, num_bytes, lambda: list(log_format.parse_lines(lines, FIELDS)))
+    del lines
+
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        # measure the embedded mode as it runs
+        configure_sqlite(engine)
+    FastModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        # rolled back: the end-to-end run below must start from an empty table
+        _measure(stages, "write", num_lines, num_bytes, lambda: LogEntryWriter(db).write(rows))
+        db.rollback()
+    del rows
+
+    decode_timestamp.cache_clear()
+    with Session(engine) as db:
+        _measure(stages, "end_to_end", num_lines, num_bytes, lambda: parse_logs(db, settings))
+    engine.dispose()
+    return {"lines": num_lines, "bytes": num_bytes, "stages": stages}
+
+
+def bench_ingest(sizes: tuple = (100_000,), seed: int = 0, settings=None, database_url: str = None) -> dict:
+    """
+    Measure each stage of the ingest path on its own and end to end.
+
+    For every size a Combined-format corpus is generated by `generate_corpus` from a fixed seed into a
+    temporary directory, then timed through: read (`LogFile`), decode_timestamp, parse
+    (`LogFormat.parse_lines`), write (`LogEntryWriter`, rolled back) and end_to_end (`parse_logs`,
+    committed). Each stage reports lines/sec and MB/sec of input, so the JSON of two releases can be
+    compared stage by stage, and the peak RSS of the process so far: a cumulative high-water mark that only
+    grows from stage to stage, not the memory of the stage itself.
+
+    Args:
+        sizes: Corpus sizes, in lines.
+        seed: Random seed for the corpora.
+        settings: Apache configuration; batch sizes and workers are taken from it. Defaults to
+            `ApacheConfig.get_config()`.
+        database_url: Database to write to. Use a scratch database: the end-to-end stage commits its rows.
+            Defaults to a temporary SQLite file.
+
+    Returns:
+        A dict with the environment and one result per size.
+    """
+
+    if settings is None:
+        from config.settings import ApacheConfig
+        settings = ApacheConfig.get_config()
+
+    runs = []
+    for num_lines in sizes:
+        with tempfile.TemporaryDirectory(prefix="logwriter-bench-") as directory:
+            run_settings = settings.model_copy(update={
+                "files_dir": directory, "file_extension": ".log", "log_format": COMBINED_LOG_FORMAT,
+            })
+            url = database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            runs.append(_bench_corpus(os.path.join(directory, "access.log"), num_lines, seed, run_settings, url))
+    return {
+        "python": platform.python_version(),
+        "database": make_url(database_url).get_backend_name() if database_url else "sqlite",
+        "seed": seed,
+        "workers": settings.ingest_workers,
+        "batch_rows": settings.batch_rows,
+        "runs": runs,
+    }
+
+
+if __name__ == "__main__":
+    print(bench_parser())
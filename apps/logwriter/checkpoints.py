@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogFileCheckpoint
+from apps.logwriter.reader import is_compressed, open_log
+
+# how much of the head of a file identifies it
+FINGERPRINT_BYTES = 1024
+
+
+def fingerprint(path: str, offset: int) -> str:
+    """
+    Hash the first ``min(offset, FINGERPRINT_BYTES)`` bytes of a file, decompressed if needed.
+    """
+
+    with open_log(path) as file:
+        return hashlib.sha1(file.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+
+def get_checkpoint(db: Session, path: str) -> LogFileCheckpoint:
+    """
+    Return the checkpoint for the file currently at `path`, creating it on first sight.
+
+    The checkpoint follows the file's inode across logrotate renames. Its offset is reset to 0 when the
+    file is now shorter than the committed offset (truncated, e.g. by copytruncate) or when its head no
+    longer matches the stored fingerprint (the inode was reused by a new file).
+
+    A file seen for the first time whose head matches an existing checkpoint is a copy of an ingested
+    file, typically ``access.log.1`` compressed into ``access.log.2.gz``, and resumes from that offset. A
+    compressed copy of an archive that was read to its end is complete too and is not read at all.
+
+    Args:
+        db: The session the checkpoint is loaded into; it is committed together with the ingested rows.
+        path: Path of the log file.
+
+    Returns:
+        The checkpoint, with `offset` pointing at the first byte still to be ingested.
+    """
+
+    stat = os.stat(path)
+    checkpoint = (
+        db.query(LogFileCheckpoint)
+        .filter(LogFileCheckpoint.device == stat.st_dev, LogFileCheckpoint.inode == stat.st_ino)
+        .one_or_none()
+    )
+    if checkpoint is None:
+        head = fingerprint(path, FINGERPRINT_BYTES)
+        copies = (
+            db.query(LogFileCheckpoint)
+            .filter(LogFileCheckpoint.fingerprint == head, LogFileCheckpoint.offset >= FINGERPRINT_BYTES)
+            .all()
+        )
+        # the furthest ingested copy; among equals a finished archive, which cannot have grown since
+        copy_of = max(copies, key=lambda copy: (copy.offset, _is_finished_archive(copy)), default=None)
+        checkpoint = LogFileCheckpoint(device=stat.st_dev, inode=stat.st_ino, path=path)
+        if copy_of is not None:
+            checkpoint.offset, checkpoint.fingerprint = copy_of.offset, copy_of.fingerprint
+            if _is_finished_archive(copy_of) and is_compressed(path):
+                checkpoint.file_size = stat.st_size
+        else:
+            checkpoint.offset, checkpoint.fingerprint = 0, fingerprint(path, 0)
+        db.add(checkpoint)
+        return checkpoint
+
+    checkpoint.path = path
+    # the size on disk of a compressed file says nothing about its decompressed length
+    truncated = not is_compressed(path) and stat.st_size < checkpoint.offset
+    if truncated or fingerprint(path, checkpoint.offset) != checkpoint.fingerprint:
+        reset_checkpoint(checkpoint)
+    return checkpoint
+
+
+def _is_finished_archive(checkpoint: LogFileCheckpoint) -> bool:
+    # an uncompressed file may have grown after it was read to its end, an archive cannot have
+    return checkpoint.file_size is not None and is_compressed(checkpoint.path)
+
+
+def is_exhausted(checkpoint: LogFileCheckpoint, log_file) -> bool:
+    """
+    Whether a compressed file has been read to the end already; archives do not grow once written.
+    """
+
+    return log_file.compressed and checkpoint.file_size == os.path.getsize(log_file.path)
+
+
+def reset_checkpoint(checkpoint: LogFileCheckpoint):
+    """
+    Start a checkpoint over from the beginning of its file.
+    """
+
+    checkpoint.offset = 0
+    checkpoint.fingerprint = fingerprint(checkpoint.path, 0)
+    checkpoint.file_size = None
+
+
+def advance_checkpoint(checkpoint: LogFileCheckpoint, offset: int, at_end: bool = False):
+    """
+    Move a checkpoint to `offset`, refreshing the fingerprint while the file head is still growing.
+    `at_end` tells that `offset` is the end of the file: its size is then recorded, and a compressed file
+    of that size is not read again (see `is_exhausted`).
+    """
+
+    if min(checkpoint.offset, offset) < FINGERPRINT_BYTES and offset != checkpoint.offset:
+        checkpoint.fingerprint = fingerprint(checkpoint.path, offset)
+    checkpoint.offset = offset
+    checkpoint.file_size = os.path.getsize(checkpoint.path) if at_end else None
+
+
+def is_recorded_at_end(checkpoint: LogFileCheckpoint) -> bool:
+    """
+    Whether a checkpoint already records its file read to the end at its current size.
+    """
+
+    return checkpoint.file_size == os.path.getsize(checkpoint.path)
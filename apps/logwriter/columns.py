@@ -0,0 +1,444 @@
+import ipaddress
+import json
+import os
+import shutil
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogEntry, network_range, pack_ip
+
+# column -> dtype of its file; one fixed-width value per entry, in ingest order
+COLUMNS = {
+    # seconds since the epoch, UTC
+    "date": np.dtype("<i8"),
+    # the 16-byte form stored by IPAddress as two big-endian halves, so (hi, lo) sorts like the address
+    "ip": np.dtype((">u8", 2)),
+    # 0 for a missing status, size or request
+    "status": np.dtype("<i2"),
+    "size": np.dtype("<i8"),
+    "request_id": np.dtype("<i8"),
+}
+
+# group keys of `aggregate` -> columns they are computed from
+GROUPS = {
+    "status": "status",
+    "hour": "date",
+    "day": "date",
+    "ip": "ip",
+    "request_id": "request_id",
+}
+
+MEASURES = ("hits", "bytes")
+
+_DAY_SECONDS = 86400
+_META = "meta.json"
+_NO_IP = bytes(16)
+
+
+def _seconds(moment: datetime) -> int:
+    # like the rollups, a naive timestamp (SQLite) is taken as UTC
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _ip_halves(value: str) -> np.ndarray:
+    return np.frombuffer(pack_ip(value), dtype=">u8")
+
+
+def _unpack_ip(packed: bytes):
+    address = ipaddress.IPv6Address(packed)
+    return address.ipv4_mapped or address
+
+
+class ColumnStore:
+    """
+    A columnar copy of the recent log entries, for aggregates that need neither SQL nor ``LogEntry`` objects.
+
+    Every UTC day is a directory (``20240110``). Each store instance that writes to a day gets a segment of
+    its own in it (``20240110/4242-9f1c0a2b``), holding one flat file per column of `COLUMNS`, which
+    readers memory-map as NumPy arrays. Concurrent writers, such as the follower and a CLI ``parse``,
+    therefore never touch each other's files.
+
+    Rows are appended by the ingest path and become visible when the session they were written with
+    commits. At that point the segment's ``meta.json`` records the rows actually on disk, and readers
+    never look past it. A rollback truncates the segment back to it.
+
+    A crash between the database commit and the ``meta.json`` update leaves the rows of that transaction
+    invisible. Run `rebuild_columns` for the days being ingested at the time of a crash.
+
+    Attributes:
+        directory (str): Root directory of the store.
+        segment (str): Name of the segments this instance writes.
+
+    Example Usage:
+        store = ColumnStore("/var/lib/logwriter/columns")
+        store.bind(db)
+        store.append(rows)
+        db.commit()  # the rows are visible now
+        columns = store.scan(start, end, ("status", "size"))
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segment = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._pending = set()
+
+    def bind(self, db: Session):
+        """
+        Commit and roll back the appended rows together with the transactions of `db`.
+        """
+
+        event.listen(db, "after_commit", lambda session: self.commit())
+        event.listen(db, "after_rollback", lambda session: self.rollback())
+
+    def _day_path(self, day: int) -> str:
+        return os.path.join(self.directory, f"{datetime.fromtimestamp(day * _DAY_SECONDS, timezone.utc):%Y%m%d}")
+
+    def _path(self, day: int, segment: str, name: str = _META) -> str:
+        return os.path.join(self._day_path(day), segment, name if name == _META else f"{name}.bin")
+
+    def segments(self, day: int) -> list[tuple[str, int]]:
+        """
+        Return the segments of the day `day` (days since the epoch) as ``(segment, committed rows)``.
+        """
+
+        directory = self._day_path(day)
+        if not os.path.isdir(directory):
+            return []
+        segments = []
+        for segment in sorted(os.listdir(directory)):
+            try:
+                with open(self._path(day, segment)) as file:
+                    segments.append((segment, json.load(file)["rows"]))
+            except FileNotFoundError:
+                # nothing committed yet
+                continue
+        return segments
+
+    def rows(self, day: int) -> int:
+        """
+        Return the number of committed rows of the day `day` (days since the epoch).
+        """
+
+        return sum(rows for _, rows in self.segments(day))
+
+    def days(self) -> list[int]:
+        """
+        Return the days of the store, as days since the epoch, oldest first.
+        """
+
+        if not os.path.isdir(self.directory):
+            return []
+        days = []
+        for name in os.listdir(self.directory):
+            try:
+                moment = datetime.strptime(name, "%Y%m%d").replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            days.append(int(moment.timestamp()) // _DAY_SECONDS)
+        return sorted(days)
+
+    def append(self, rows: Iterable[dict]):
+        """
+        Append rows to the store, uncommitted.
+
+        Args:
+            rows: Dicts with ``date``, ``ip``, ``status``, ``size`` and ``request_id``, as encoded by
+                `LogEntryWriter`.
+        """
+
+        rows = list(rows)
+        if not rows:
+            return
+        values = {
+            "date": np.array([_seconds(row["date"]) for row in rows], dtype=COLUMNS["date"]),
+            "ip": np.frombuffer(b"".join([pack_ip(row["ip"]) if row["ip"] else _NO_IP for row in rows]),
+                                dtype=">u8").reshape(-1, 2),
+            "status": np.array([row["status"] or 0 for row in rows], dtype=COLUMNS["status"]),
+            "size": np.array([row["size"] or 0 for row in rows], dtype=COLUMNS["size"]),
+            "request_id": np.array([row["request_id"] or 0 for row in rows], dtype=COLUMNS["request_id"]),
+        }
+        days = values["date"] // _DAY_SECONDS
+        for day in np.unique(days):
+            day = int(day)
+            selected = days == day
+            if day not in self._pending:
+                os.makedirs(os.path.dirname(self._path(day, self.segment)), exist_ok=True)
+                self._pending.add(day)
+            for name, column in values.items():
+                with open(self._path(day, self.segment, name), "ab") as file:
+                    column[selected].tofile(file)
+
+    def _committed(self, day: int) -> int:
+        try:
+            with open(self._path(day, self.segment)) as file:
+                return json.load(file)["rows"]
+        except FileNotFoundError:
+            return 0
+
+    def _written(self, day: int) -> int:
+        # only this instance writes its segment, so the shortest column file holds every complete row
+        return min(os.path.getsize(self._path(day, self.segment, name)) // dtype.itemsize
+                   for name, dtype in COLUMNS.items())
+
+    def _truncate(self, day: int, rows: int):
+        for name, dtype in COLUMNS.items():
+            path = self._path(day, self.segment, name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                os.truncate(path, rows * dtype.itemsize)
+
+    def commit(self):
+        """
+        Make the appended rows visible.
+        """
+
+        for day in self._pending:
+            meta = self._path(day, self.segment)
+            with open(f"{meta}.tmp", "w") as file:
+                json.dump({"rows": self._written(day)}, file)
+            os.replace(f"{meta}.tmp", meta)
+        self._pending.clear()
+
+    def rollback(self):
+        """
+        Discard the rows appended since the last commit.
+        """
+
+        for day in self._pending:
+            self._truncate(day, self._committed(day))
+        self._pending.clear()
+
+    def drop_day(self, day: int):
+        shutil.rmtree(self._day_path(day), ignore_errors=True)
+        self._pending.discard(day)
+
+    def prune(self, cutoff: datetime) -> list[int]:
+        """
+        Drop the days that end before `cutoff`.
+
+        Returns:
+            The days dropped, as days since the epoch.
+        """
+
+        last = _seconds(cutoff) // _DAY_SECONDS
+        dropped = [day for day in self.days() if day < last]
+        for day in dropped:
+            self.drop_day(day)
+        return dropped
+
+    def scan_days(self, start: datetime, end: datetime,
+                  columns: Iterable[str] = COLUMNS) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Yield the committed rows of ``[start, end)`` one day segment at a time, as column name -> array;
+        ``ip`` has the shape ``(rows, 2)``.
+
+        The segment files are memory-mapped: only the pages of the requested columns are read, and the days
+        that lie entirely within the range are not copied at all. ``date`` is only read for the days the
+        range cuts.
+        """
+
+        columns = list(columns)
+        first, last = _seconds(start), _seconds(end)
+        for day in self.days():
+            if not first // _DAY_SECONDS <= day <= (last - 1) // _DAY_SECONDS:
+                continue
+            for segment, rows in self.segments(day):
+                if not rows:
+                    continue
+                arrays = {name: self._map(day, segment, name, rows) for name in columns}
+                if first > day * _DAY_SECONDS or last < (day + 1) * _DAY_SECONDS:
+                    dates = arrays["date"] if "date" in arrays else self._map(day, segment, "date", rows)
+                    selected = (dates >= first) & (dates < last)
+                    arrays = {name: array[selected] for name, array in arrays.items()}
+                yield arrays
+
+    def _map(self, day: int, segment: str, name: str, rows: int) -> np.ndarray:
+        return np.memmap(self._path(day, segment, name), dtype=COLUMNS[name], mode="r", shape=(rows,))
+
+    def scan(self, start: datetime, end: datetime, columns: Iterable[str] = COLUMNS) -> dict[str, np.ndarray]:
+        """
+        Read the committed rows of ``[start, end)`` into one array per column, see `scan_days`.
+        """
+
+        columns = list(columns)
+        parts = {name: [] for name in columns}
+        for arrays in self.scan_days(start, end, columns):
+            for name, array in arrays.items():
+                parts[name].append(array)
+        return {
+            name: np.concatenate(arrays) if arrays else np.empty((0,), dtype=COLUMNS[name])
+            for name, arrays in parts.items()
+        }
+
+
+def filter_mask(columns: dict[str, np.ndarray], ip: str = None, status: int = None) -> np.ndarray | None:
+    """
+    Return the boolean mask of the rows of `columns` matching an address or CIDR block and a status, like
+    `filter_log_entries`, or None when there is nothing to filter.
+
+    Raises:
+        ValueError: If `ip` is not an address or a network.
+    """
+
+    mask = None
+    if ip:
+        (low_hi, low_lo), (high_hi, high_lo) = (_ip_halves(value) for value in network_range(ip))
+        hi, lo = columns["ip"][:, 0], columns["ip"][:, 1]
+        mask = (((hi > low_hi) | ((hi == low_hi) & (lo >= low_lo)))
+                & ((hi < high_hi) | ((hi == high_hi) & (lo <= high_lo))))
+    if status:
+        matching = columns["status"] == int(status)
+        mask = matching if mask is None else mask & matching
+    return mask
+
+
+def group_by(keys: np.ndarray, weights: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Count the rows, or sum their `weights`, per distinct key.
+
+    Small integer key ranges (statuses, hours, days) are counted with `np.bincount` in one pass, anything
+    else is sorted first. Keys of shape ``(rows, n)``, such as addresses, are compared row by row.
+
+    Returns:
+        The distinct keys, sorted, and their counts or sums.
+    """
+
+    if keys.ndim == 2 and len(keys) and (keys[:, 0] == keys[0, 0]).all():
+        # only IPv4 clients, the usual case: the second half alone tells the keys apart
+        unique, values = group_by(keys[:, 1], weights)
+        return np.column_stack([np.full(len(unique), keys[0, 0], dtype=keys.dtype), unique]), values
+    if keys.ndim == 2:
+        # np.unique(axis=0) is much slower than sorting the key columns themselves
+        order = np.lexsort(keys.T[::-1])
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        if weights is None:
+            values = np.diff(np.r_[starts, len(keys)])
+        else:
+            values = np.add.reduceat(np.asarray(weights)[order], starts)
+        return keys[starts], values.astype(np.int64)
+    if keys.dtype.kind in "iu" and keys.size and int(keys.max()) - int(keys.min()) < 1 << 20:
+        low = keys.min()
+        offsets = (keys - low).astype(np.intp)
+        counts = np.bincount(offsets)
+        present = np.flatnonzero(counts)
+        values = counts if weights is None else np.bincount(offsets, weights=weights)
+        return present + low, values[present].astype(np.int64)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights, minlength=len(unique)).astype(np.int64)
+
+
+def aggregate(store: ColumnStore, start: datetime, end: datetime, by: str = "status", measure: str = "hits",
+              ip: str = None, status: int = None) -> list[dict]:
+    """
+    Count the hits or sum the bytes of ``[start, end)`` per status, hour, day, client address or request.
+
+    Args:
+        by: One of `GROUPS`.
+        measure: "hits" or "bytes".
+        ip, status: Filters, as in `filter_mask`.
+
+    Returns:
+        Dicts with ``key`` (a status, a UTC datetime, an address or a request id) and ``value``, in key
+        order.
+
+    Raises:
+        ValueError: If `by`, `measure` or `ip` is invalid.
+
+    Example Usage:
+        now = datetime.now(timezone.utc)
+        bytes_by_status = aggregate(store, now - timedelta(days=7), now, by="status", measure="bytes")
+    """
+
+    if by not in GROUPS:
+        raise ValueError(f"Unsupported group {by!r}, expected one of {', '.join(GROUPS)}")
+    if measure not in MEASURES:
+        raise ValueError(f"Unsupported measure {measure!r}, expected one of {', '.join(MEASURES)}")
+    needed = {GROUPS[by]}
+    if measure == "bytes":
+        needed.add("size")
+    if ip:
+        needed.add("ip")
+    if status:
+        needed.add("status")
+
+    # grouped segment by segment straight from the mapped files, then the (much smaller) partial results together
+    partial_keys, partial_values = [], []
+    for columns in store.scan_days(start, end, needed):
+        mask = filter_mask(columns, ip, status)
+        if mask is not None:
+            columns = {name: array[mask] for name, array in columns.items()}
+        keys = columns[GROUPS[by]]
+        if not len(keys):
+            continue
+        if by == "day":
+            # the rows of a day segment share their key
+            keys = keys[:1] // _DAY_SECONDS * _DAY_SECONDS
+            values = np.array([columns["size"].sum() if measure == "bytes" else len(columns["date"])])
+        else:
+            if by == "hour":
+                keys = keys // 3600 * 3600
+            keys, values = group_by(keys, columns["size"] if measure == "bytes" else None)
+        partial_keys.append(keys)
+        partial_values.append(values)
+    if not partial_keys:
+        return []
+    keys, values = group_by(np.concatenate(partial_keys), np.concatenate(partial_values))
+
+    if by in ("hour", "day"):
+        keys = [datetime.fromtimestamp(int(key), timezone.utc) for key in keys]
+    elif by == "ip":
+        keys = [str(_unpack_ip(key.astype(">u8").tobytes())) for key in keys]
+    else:
+        keys = keys.tolist()
+    return [{"key": key, "value": value} for key, value in zip(keys, values.tolist())]
+
+
+def rebuild_columns(db: Session, store: ColumnStore, first: date, last: date = None,
+                    batch_size: int = 100_000) -> int:
+    """
+    Rewrite the store for the UTC days `first` to `last` (both included) from ``log_entries``, e.g. after
+    enabling it or after a backfill that bypassed the ingest path. Run it while nothing is being ingested
+    for those days.
+
+    Returns:
+        The number of entries written.
+    """
+
+    last = last or first
+    start = datetime(first.year, first.month, first.day, tzinfo=timezone.utc)
+    end = datetime(last.year, last.month, last.day, tzinfo=timezone.utc) + timedelta(days=1)
+    for day in range(_seconds(start) // _DAY_SECONDS, _seconds(end) // _DAY_SECONDS):
+        store.drop_day(day)
+    rows = db.execute(
+        select(LogEntry.date, LogEntry.ip, LogEntry.status, LogEntry.size, LogEntry.request_id)
+        .where(LogEntry.date >= start, LogEntry.date < end)
+        .order_by(LogEntry.date)
+        .execution_options(yield_per=batch_size)
+    ).mappings()
+    count = 0
+    for batch in rows.partitions(batch_size):
+        store.append(batch)
+        count += len(batch)
+    store.commit()
+    return count
+
+
+def prune_columns(settings, now: datetime = None) -> list[int]:
+    """
+    Drop the days of `settings.columnar_dir` older than `settings.columnar_days`.
+
+    Returns:
+        The days dropped, as days since the epoch.
+    """
+
+    if not settings.columnar_dir:
+        return []
+    now = now or datetime.now(timezone.utc)
+    return ColumnStore(settings.columnar_dir).prune(now - timedelta(days=settings.columnar_days))
@@ -0,0 +1,221 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from apps.logwriter.checkpoints import advance_checkpoint, get_checkpoint, reset_checkpoint
+from apps.logwriter.log_format import get_log_format
+from apps.logwriter.parser import log_files
+from apps.logwriter.quarantine import Quarantine
+from apps.logwriter.reader import LogFile
+from apps.logwriter.writer import FIELDS, LogEntryWriter
+
+# advisory lock held by the one follower allowed to run against a database
+FOLLOWER_LOCK = "log_entries_follower"
+
+
+class _TailedFile:
+    def __init__(self, log_file: LogFile, checkpoint, now: float):
+        self.log_file = log_file
+        self.checkpoint = checkpoint
+        self.committed_offset = log_file.offset
+        self.seen_at = now
+
+
+class LogFollower:
+    """
+    Tails the log files in FILES_DIR and ingests new lines in micro-batches.
+
+    Files are tracked by (device, inode) and kept open, so a logrotate rename is followed and the old file
+    is drained until it has been out of sight for `rotate_grace` seconds. Truncated files are re-read from
+    the start. New files are opened one per poll after a commit, so a compressed copy of a file that was
+    just read resumes where that file ended instead of being read again. Rows, file checkpoints and rejected
+    lines are committed together whenever `flush_rows` lines are pending or `flush_interval` seconds have
+    passed since the last commit; stopping loses at most the pending batch, which is re-read from the
+    checkpoints on the next start.
+
+    Offsets are kept in memory between commits, so two followers would ingest the same lines twice. On
+    PostgreSQL a follower holds an advisory lock while it runs; followers started in other processes,
+    e.g. by each API worker, wait for it and take over when it stops.
+
+    Attributes:
+        db (Session): Session used for writing; it should not be shared with other threads.
+        settings: Apache configuration (`ApacheConfig.get_config()`).
+        flush_interval (float): Maximum seconds between commits of pending rows.
+        flush_rows (int): Maximum number of rows and rejected lines per commit.
+        poll_interval (float): Seconds to sleep when there is nothing new to read.
+        rotate_grace (float): Seconds a vanished file keeps being drained before it is closed.
+        lock_retry (float): Seconds between attempts to take over from the running follower.
+
+    Example Usage:
+        with Session(DatabaseManager.engine) as db:
+            LogFollower(db, ApacheConfig.get_config()).run()
+    """
+
+    def __init__(self, db: Session, settings, flush_interval: float = None, flush_rows: int = None,
+                 poll_interval: float = 0.25, rotate_grace: float = 30.0, lock_retry: float = 5.0):
+        self.db = db
+        self.settings = settings
+        self.flush_interval = flush_interval if flush_interval is not None else settings.follow_flush_ms / 1000
+        self.flush_rows = flush_rows or settings.follow_flush_rows
+        self.poll_interval = min(poll_interval, self.flush_interval)
+        self.rotate_grace = rotate_grace
+        self.lock_retry = lock_retry
+        self.log_format = get_log_format(settings.log_format)
+        self.writer = LogEntryWriter(db, partition_interval=settings.partition_interval,
+                                     columnar_dir=settings.columnar_dir)
+        self.quarantine = Quarantine(db)
+        self._files: dict[tuple[int, int], _TailedFile] = {}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def run(self, should_stop: Callable[[], bool] = lambda: False):
+        """
+        Follow the files until `should_stop` returns True (or forever).
+        """
+
+        with self._only_follower(should_stop) as following:
+            if not following:
+                return
+            try:
+                while not should_stop():
+                    if not self.poll():
+                        time.sleep(self.poll_interval)
+            finally:
+                self.db.rollback()
+                self.close()
+
+    def poll(self) -> int:
+        """
+        Read whatever has been appended since the last poll, flushing when a batch is due.
+
+        Returns:
+            The number of rows read.
+        """
+
+        now = time.monotonic()
+        self._discover(now)
+        read = sum(self._read(tailed) for tailed in self._files.values())
+        self._forget(now)
+        if self._unflushed() and now - self._last_flush >= self.flush_interval:
+            self.flush()
+        return read
+
+    def flush(self):
+        """
+        Commit pending rows together with the offsets they end at.
+        """
+
+        for tailed in self._files.values():
+            self._advance(tailed)
+        self.quarantine.flush()
+        self.db.commit()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        for tailed in self._files.values():
+            tailed.log_file.close()
+        self._files.clear()
+
+    @contextmanager
+    def _only_follower(self, should_stop: Callable[[], bool]):
+        """
+        Wait until no other follower runs against the database; yields False if stopped while waiting.
+        """
+
+        engine = self.db.get_bind().engine
+        if engine.dialect.name != "postgresql":
+            yield True
+            return
+        # a session-level lock outlives the commits, so it is taken on a connection of its own
+        with engine.connect() as connection:
+            lock = text("SELECT pg_try_advisory_lock(hashtext(:name))")
+            waiting = False
+            while not connection.execute(lock, {"name": FOLLOWER_LOCK}).scalar():
+                connection.commit()
+                if not waiting:
+                    logging.info("Another process is following the log files, waiting for it to stop")
+                    waiting = True
+                if should_stop():
+                    yield False
+                    return
+                time.sleep(self.lock_retry)
+            connection.commit()
+            try:
+                yield True
+            finally:
+                # the connection goes back to the pool, which keeps session-level locks
+                connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": FOLLOWER_LOCK})
+                connection.commit()
+
+    def _discover(self, now: float):
+        opened = False
+        for path in log_files(self.settings):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            key = (stat.st_dev, stat.st_ino)
+            tailed = self._files.get(key)
+            if tailed is None:
+                if opened:
+                    # it may be a copy of the file just opened (rotated and compressed), which resumes from
+                    # that file's committed offset: it is opened on the next poll, once that file is read
+                    continue
+                if self._files:
+                    self.flush()
+                opened = True
+                checkpoint = get_checkpoint(self.db, path)
+                self._files[key] = _TailedFile(LogFile(path, checkpoint.offset).open(), checkpoint, now)
+                continue
+
+            tailed.seen_at = now
+            if tailed.log_file.path != path:
+                # renamed by logrotate, the open handle already follows the inode
+                tailed.log_file.path = tailed.checkpoint.path = path
+            if not tailed.log_file.compressed and stat.st_size < tailed.log_file.offset:
+                # truncated in place (copytruncate)
+                reset_checkpoint(tailed.checkpoint)
+                tailed.log_file.offset = tailed.committed_offset = 0
+
+    def _read(self, tailed: _TailedFile) -> int:
+        read = 0
+        while True:
+            offset = tailed.log_file.offset
+            budget = self.flush_rows - self._unflushed()
+            lines = islice(tailed.log_file, budget)
+            rows = self.log_format.parse_lines(lines, FIELDS, self.quarantine.rejecter(tailed.log_file))
+            written = self.writer.write(rows)
+            self._pending += written
+            read += written
+            if self._unflushed() >= self.flush_rows:
+                self.flush()
+            if tailed.log_file.offset == offset:
+                return read
+
+    def _unflushed(self) -> int:
+        # rejected lines count too, or a stream of nothing but malformed lines would never be committed
+        return self._pending + self.quarantine.pending
+
+    def _forget(self, now: float):
+        for key, tailed in list(self._files.items()):
+            if now - tailed.seen_at > self.rotate_grace:
+                self._advance(tailed)
+                tailed.log_file.close()
+                del self._files[key]
+
+    @staticmethod
+    def _advance(tailed: _TailedFile):
+        if tailed.log_file.offset != tailed.committed_offset:
+            try:
+                advance_checkpoint(tailed.checkpoint, tailed.log_file.offset)
+            except FileNotFoundError:
+                # already unlinked, nothing will ever resume from this checkpoint
+                pass
+            tailed.committed_offset = tailed.log_file.offset
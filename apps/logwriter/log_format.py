@@ -0,0 +1,289 @@
+import ipaddress
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator
+
+
+class LogFormatError(ValueError):
+    """
+    Raised when a line does not match the configured Apache LogFormat.
+
+    Attributes:
+        reason (str): Why the line was rejected, without the line itself.
+        line (str): The offending line, if any.
+    """
+
+    def __init__(self, reason: str, line: str = None):
+        self.reason = reason
+        self.line = line
+        super().__init__(reason if line is None else f"{reason}: {line[:200]!r}")
+
+
+_OCTET = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+
+# a client address, stored as inet
+_IP = rf"{_OCTET}(?:\.{_OCTET}){{3}}|[\da-fA-F.]*:[\da-fA-F:.]*"
+
+# what %h logs instead of the address with HostnameLookups on; kept as text in its own field
+_HOST = r"[\w.-]+"
+
+# directive -> (field name, value pattern)
+_DIRECTIVES = {
+    "a": ("ip", _IP),
+    "h": ("ip", _IP),
+    "A": ("local_ip", r"\S+"),
+    "l": ("ident", r"\S+"),
+    "u": ("user", r"\S+"),
+    "t": ("date", r"[^\]]+"),
+    "r": ("request", None),
+    "s": ("status", r"\d{3}|-"),
+    "b": ("size", r"\d+|-"),
+    "B": ("size", r"\d+"),
+    "D": ("duration_us", r"\d+"),
+    "T": ("duration_s", r"\d+"),
+    "m": ("method", r"\S+"),
+    "U": ("path", r"\S+"),
+    "q": ("query", r"\S*"),
+    "H": ("protocol", r"\S+"),
+    "v": ("server_name", r"\S+"),
+    "V": ("server_name", r"\S+"),
+    "p": ("port", r"\d+"),
+    "P": ("pid", r"\d+"),
+    "I": ("bytes_received", r"\d+"),
+    "O": ("bytes_sent", r"\d+"),
+    "k": ("keepalive", r"\d+"),
+}
+
+# %{Header}i names that map onto well-known fields
+_HEADERS = {
+    "referer": "referer",
+    "user-agent": "user_agent",
+}
+
+# any quoted value, honoring the \" escapes Apache writes
+_QUOTED = r'[^"\\]*(?:\\.[^"\\]*)*'
+
+_DIRECTIVE_RE = re.compile(r"%(?:[<>]|!?\d{3}(?:,\d{3})*)*(?:\{([^}]*)\})?([a-zA-Z%])")
+
+
+def _to_int(value: str) -> int:
+    # Apache writes "-" for a zero-byte %b
+    return 0 if value == "-" else int(value)
+
+
+_MONTHS = {
+    month: number
+    for number, month in enumerate(("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1)
+}
+
+_TIMESTAMP_RE = re.compile(r"\d\d/[A-Z][a-z]{2}/\d{4}:\d\d:\d\d:\d\d(?: [+-]\d{4})? ?")
+
+
+@lru_cache(maxsize=None)
+def _timezone(offset: str) -> timezone:
+    if not offset:
+        return timezone.utc
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    return timezone(timedelta(minutes=-minutes if offset[0] == "-" else minutes))
+
+
+# consecutive lines almost always share the same second, so each distinct %t value is decoded once
+@lru_cache(maxsize=4096)
+def decode_timestamp(value: str) -> datetime:
+    """
+    Decode an Apache ``%t`` value such as ``10/Oct/2000:13:55:36 -0700`` into an aware datetime.
+
+    The value has fixed-width fields, which are sliced out directly instead of going through strptime.
+    A value without a UTC offset is taken as UTC.
+
+    Raises:
+        ValueError: If the value is not an Apache timestamp.
+    """
+
+    if not _TIMESTAMP_RE.fullmatch(value) or value[3:6] not in _MONTHS:
+        raise ValueError(f"not an Apache timestamp: {value!r}")
+    return datetime(
+        int(value[7:11]), _MONTHS[value[3:6]], int(value[0:2]),
+        int(value[12:14]), int(value[15:17]), int(value[18:20]),
+        tzinfo=_timezone(value[21:26]),
+    )
+
+
+def split_request(request: str) -> dict:
+    """
+    Split a ``%r`` request line such as ``GET /search?q=1 HTTP/1.1`` into its parts.
+
+    The method ends at the first space and the protocol starts after the last one; Apache logs the target
+    in between as sent, spaces included (``GET /a b.html HTTP/1.1``).
+
+    Returns:
+        A dict with ``method``, ``path``, ``query`` (without the ``?``) and ``protocol``; parts missing from
+        the line, or all of them for a line that is not a request (``-``, probes, garbage), are None.
+    """
+
+    method, _, target = request.partition(" ")
+    protocol = None
+    if " " in target:
+        target, _, protocol = target.rpartition(" ")
+    # else HTTP/0.9, which has no protocol
+    if not method or not target:
+        return {"method": None, "path": None, "query": None, "protocol": None}
+    path, question, query = target.partition("?")
+    return {"method": method, "path": path, "query": query if question else None, "protocol": protocol or None}
+
+
+def _to_ip(value: str | None) -> str | None:
+    # an IPv4 address is fully checked by the line pattern; IPv6 only roughly, so it is validated here
+    if value and ":" in value:
+        ipaddress.ip_address(value)
+    return value
+
+
+_CONVERTERS = {
+    "ip": _to_ip,
+    "status": _to_int,
+    "size": _to_int,
+    "date": decode_timestamp,
+}
+
+
+def _field_for(name: str | None, directive: str) -> tuple[str, str | None]:
+    if name is not None and directive in "ioenC":
+        field = _HEADERS.get(name.lower(), re.sub(r"\W", "_", name).lower())
+        return field, r"\S+"
+    if name is None and directive in _DIRECTIVES:
+        return _DIRECTIVES[directive]
+    raise LogFormatError(f"Unsupported LogFormat directive: %{'{' + name + '}' if name else ''}{directive}")
+
+
+class LogFormat:
+    """
+    A compiled Apache ``LogFormat`` string.
+
+    The format is translated once into a single regular expression with one named group per
+    directive, so each log line costs one ``match`` call plus the conversion of a few typed fields.
+
+    A ``%h`` value that is a host name rather than an address goes to the ``host`` field, with ``ip``
+    left None.
+
+    Attributes:
+        log_format (str): The source Apache LogFormat string.
+        fields (tuple[str, ...]): Names of the fields captured from each line, in format order.
+
+    Example Usage:
+        log_format = LogFormat('%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"')
+        row = log_format.parse(line)
+        row["ip"], row["date"], row["status"]
+    """
+
+    def __init__(self, log_format: str):
+        self.log_format = log_format
+        fields = []
+        pattern = []
+        position = 0
+
+        for match in _DIRECTIVE_RE.finditer(log_format):
+            literal = log_format[position:match.start()]
+            pattern.append(re.escape(literal))
+            position = match.end()
+
+            name, directive = match.groups()
+            if directive == "%":
+                pattern.append("%")
+                continue
+
+            field, value = _field_for(name, directive)
+            quoted = literal.endswith('"') and log_format.startswith('"', position)
+            if quoted or value is None:
+                value = _QUOTED
+            host_names = directive == "h" and not quoted
+            if field in fields:
+                # the same field twice (e.g. %h and %a): keep the first occurrence only
+                group = f"(?:{value}|{_HOST})" if host_names else f"(?:{value})"
+            elif host_names:
+                group = f"(?:(?P<ip>{value})|(?P<host>{_HOST}))"
+                fields += ["ip", "host"]
+            else:
+                group = f"(?P<{field}>{value})"
+                fields.append(field)
+            if directive == "t":
+                group = rf"\[{group}\]"
+            pattern.append(group)
+
+        pattern.append(re.escape(log_format[position:].rstrip()))
+
+        self.fields = tuple(fields)
+        self._match = re.compile("".join(pattern)).match
+        self._converters = tuple((field, _CONVERTERS[field]) for field in self.fields if field in _CONVERTERS)
+
+    def parse(self, line: str) -> dict:
+        """
+        Parse a single log line.
+
+        Args:
+            line: A raw log line, with or without the trailing newline.
+
+        Returns:
+            A dict mapping field names to values; ``status`` and ``size`` are ints, ``date`` is a datetime.
+
+        Raises:
+            LogFormatError: If the line does not match the format or a typed field cannot be converted.
+        """
+
+        match = self._match(line)
+        if match is None:
+            raise LogFormatError(f"Line does not match LogFormat {self.log_format!r}", line)
+        if "\x00" in line:
+            # left behind by a crash mid-write, and not storable in a text column
+            raise LogFormatError("NUL byte in line", line)
+        row = match.groupdict()
+        try:
+            for field, convert in self._converters:
+                row[field] = convert(row[field])
+        except ValueError as ex:
+            raise LogFormatError(f"Invalid {field} value {row[field]!r}: {ex}", line) from None
+        return row
+
+    def parse_lines(self, lines: Iterable[str], fields: Iterable[str] = (),
+                    reject: Callable[[str, LogFormatError], None] = None) -> Iterator[dict]:
+        """
+        Parse lines lazily.
+
+        Args:
+            lines: Raw log lines.
+            fields: Fields every row must have; those the format does not capture are set to None.
+            reject: Called with each line that cannot be parsed and the error, instead of raising.
+
+        Returns:
+            An iterator over parsed rows.
+        """
+
+        missing = dict.fromkeys(field for field in fields if field not in self.fields)
+        if reject is None and not missing:
+            return map(self.parse, lines)
+        return self._parse_lines(lines, missing, reject)
+
+    def _parse_lines(self, lines: Iterable[str], missing: dict, reject) -> Iterator[dict]:
+        parse = self.parse
+        for line in lines:
+            try:
+                row = parse(line)
+            except LogFormatError as error:
+                if reject is None:
+                    raise
+                reject(line, error)
+                continue
+            if missing:
+                row.update(missing)
+            yield row
+
+
+@lru_cache(maxsize=None)
+def get_log_format(log_format: str) -> LogFormat:
+    """
+    Return the compiled LogFormat for a format string, compiling it on first use.
+    """
+
+    return LogFormat(log_format)
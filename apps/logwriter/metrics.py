@@ -0,0 +1,150 @@
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterable, TextIO
+
+# a sink receives a snapshot of the metrics and whether the run has finished
+MetricsSink = Callable[[dict, bool], None]
+
+# stages timed during an ingest, in pipeline order
+STAGES = ("read", "parse", "encode", "write", "rollup", "commit")
+
+
+class IngestMetrics:
+    """
+    Counters and per-stage timers of one ingest run, reported to pluggable sinks.
+
+    Stages are timed in wall-clock seconds and in CPU seconds of the timing thread, so a stage whose wall
+    time is well above its CPU time was waiting (on the disk, the parser processes or the database).
+    `report()` passes a snapshot to every sink; intermediate reports are throttled to one per `interval`.
+
+    Counters:
+        files, bytes_read, lines_parsed, lines_rejected, rows_written, batches.
+
+    Attributes:
+        sinks (list): Callables taking ``(snapshot, final)``.
+        interval (float): Minimum number of seconds between two intermediate reports.
+
+    Example Usage:
+        metrics = IngestMetrics([ProgressLine(), log_sink])
+        parse_logs(db, settings, metrics=metrics)
+    """
+
+    def __init__(self, sinks: Iterable[MetricsSink] = (), interval: float = 1.0):
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.counters = Counter()
+        self.seconds = Counter()
+        self.cpu_seconds = Counter()
+        self.max_seconds = Counter()
+        self._reported = self.started
+
+    def add(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def set(self, name: str, value: int):
+        self.counters[name] = value
+
+    def record(self, stage: str, seconds: float, cpu_seconds: float = 0.0):
+        self.seconds[stage] += seconds
+        self.cpu_seconds[stage] += cpu_seconds
+        self.max_seconds[stage] = max(self.max_seconds[stage], seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, time.thread_time() - cpu_started)
+
+    def snapshot(self) -> dict:
+        """
+        Return the metrics as a flat dict: counters, then ``<stage>_seconds``, ``<stage>_cpu_seconds``
+        and ``<stage>_max_seconds`` for every timed stage.
+        """
+
+        snapshot = {"elapsed_seconds": round(time.perf_counter() - self.started, 3)}
+        for name in ("files", "bytes_read", "lines_parsed", "lines_rejected", "rows_written", "batches"):
+            snapshot[name] = self.counters[name]
+        stages = [stage for stage in STAGES if stage in self.seconds]
+        for stage in stages + sorted(set(self.seconds) - set(stages)):
+            snapshot[f"{stage}_seconds"] = round(self.seconds[stage], 3)
+            snapshot[f"{stage}_cpu_seconds"] = round(self.cpu_seconds[stage], 3)
+            snapshot[f"{stage}_max_seconds"] = round(self.max_seconds[stage], 3)
+        return snapshot
+
+    def report(self, final: bool = False):
+        now = time.perf_counter()
+        if not self.sinks or (not final and now - self._reported < self.interval):
+            return
+        self._reported = now
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink(snapshot, final)
+
+
+def log_sink(snapshot: dict, final: bool):
+    """
+    Log a summary line when the run finishes.
+    """
+
+    if final:
+        logging.info("ingest finished: " + ", ".join(f"{name}={value}" for name, value in snapshot.items()))
+
+
+class JsonLinesSink:
+    """
+    Append the final snapshot of every run to a JSON Lines file, for comparing runs over time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, snapshot: dict, final: bool):
+        if final:
+            with open(self.path, "a") as file:
+                file.write(json.dumps({"finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), **snapshot}) + "\n")
+
+
+class ProgressLine:
+    """
+    A live one-line progress display: throughput and the share of time spent in each stage.
+    """
+
+    def __init__(self, stream: TextIO = sys.stderr):
+        self.stream = stream
+
+    def __call__(self, snapshot: dict, final: bool):
+        elapsed = snapshot["elapsed_seconds"] or 1e-9
+        staged = sum(snapshot.get(f"{stage}_seconds", 0) for stage in STAGES) or 1e-9
+        shares = " ".join(
+            f"{stage} {snapshot[f'{stage}_seconds'] / staged:.0%}"
+            for stage in STAGES if f"{stage}_seconds" in snapshot
+        )
+        line = (
+            f"{snapshot['files']} files, {snapshot['bytes_read'] / 1024 / 1024:.1f} MB, "
+            f"{snapshot['rows_written']} rows ({snapshot['rows_written'] / elapsed:.0f}/s, "
+            f"{snapshot['bytes_read'] / 1024 / 1024 / elapsed:.1f} MB/s), "
+            f"{snapshot['lines_rejected']} rejected | {shares}"
+        )
+        self.stream.write(f"\r\x1b[K{line}" + ("\n" if final else ""))
+        self.stream.flush()
+
+
+def ingest_metrics(settings, progress: bool = False) -> IngestMetrics:
+    """
+    Build the metrics of an ingest run: logged when it finishes, appended to `settings.metrics_file`
+    if set, and shown as a live progress line on stderr if `progress` is true.
+    """
+
+    sinks = [log_sink]
+    if settings.metrics_file:
+        sinks.append(JsonLinesSink(settings.metrics_file))
+    if progress:
+        sinks.append(ProgressLine())
+    return IngestMetrics(sinks)
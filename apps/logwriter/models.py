@@ -1,18 +1,302 @@
+import hashlib
+import ipaddress
+from datetime import timezone
+from functools import lru_cache
+
 from sqlalchemy import (
     Column,
+    Index,
     Integer,
+    BigInteger,
     String,
     DateTime,
+    UniqueConstraint,
+    ForeignKey,
+    LargeBinary,
+    TypeDecorator,
     func
 )
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.orm import relationship
+from apps.logwriter.log_format import split_request
 from config.database import FastModel
 
 
+_IPV4_MAPPED = b"\0" * 10 + b"\xff" * 2
+
+
+@lru_cache(maxsize=65536)
+def pack_ip(value: str) -> bytes:
+    # clients repeat a lot in a log, parsing every address again dominated bulk loads into SQLite
+    packed = ipaddress.ip_address(value).packed
+    return packed if len(packed) == 16 else _IPV4_MAPPED + packed
+
+
+class IPAddress(TypeDecorator):
+    """
+    An IPv4 or IPv6 address, given and returned as a string.
+
+    Stored as ``inet`` on PostgreSQL and as the 16-byte IPv6 form (IPv4 as ``::ffff:a.b.c.d``) elsewhere.
+    Both sort by address, so a network is a contiguous range of the index (see `network_range`).
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(INET())
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return pack_ip(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        if dialect.name == "postgresql":
+            # psycopg2 returns inet as a string, asyncpg as an ipaddress object
+            return str(value)
+        address = ipaddress.IPv6Address(bytes(value))
+        return str(address.ipv4_mapped or address)
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    A point in time, given as an aware datetime and returned as one.
+
+    Stored as ``timestamptz`` on PostgreSQL. SQLite has no time zones and would keep the local wall time of
+    an aware value without its offset, so values are converted to UTC before they are stored there and
+    read back as UTC. Naive values are taken as UTC already.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or value.tzinfo is None or dialect.name == "postgresql":
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def process_result_value(self, value, dialect):
+        if value is None or value.tzinfo is not None:
+            return value
+        return value.replace(tzinfo=timezone.utc)
+
+
+def network_range(network: str) -> tuple[str, str]:
+    """
+    First and last address of a network given in CIDR notation ("10.0.0.0/8"); a single address is a /32 or /128.
+
+    Raises:
+        ValueError: If `network` is not a network or an address.
+    """
+
+    network = ipaddress.ip_network(network, strict=False)
+    return str(network.network_address), str(network.broadcast_address)
+
+
+def value_hash(value: str) -> str:
+    """
+    Key of a value in a dimension table; long values cannot be indexed directly.
+    """
+
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+class _Dimension:
+    # one row per distinct value, log_entries refers to it by id
+    id = Column(Integer, primary_key=True)
+    hash = Column(String(32), nullable=False, unique=True,
+                  default=lambda context: value_hash(context.get_current_parameters()["value"]))
+    value = Column(String, nullable=False)
+
+    @staticmethod
+    def split(value: str) -> dict:
+        # extra columns derived from the value
+        return {}
+
+
+class LogRequest(_Dimension, FastModel):
+    """
+    LogRequest is a distinct request line ("GET /index.html?page=2 HTTP/1.1").
+
+    The line is also stored split into its parts, so requests can be filtered and grouped by path
+    or method with an index lookup on this (small) table instead of a pattern match over log_entries.
+
+    Attributes:
+        method (str, optional): "GET".
+        path (str, optional): "/index.html".
+        query (str, optional): "page=2", without the "?".
+        protocol (str, optional): "HTTP/1.1".
+    """
+
+    __tablename__ = 'log_requests'
+    method = Column(String, index=True)
+    path = Column(String)
+    query = Column(String)
+    protocol = Column(String)
+
+    # a hash index has no length limit, unlike a btree one, and paths can be up to 8 KB long
+    __table_args__ = (Index('ix_log_requests_path', 'path', postgresql_using='hash'),)
+
+    split = staticmethod(split_request)
+
+
+class LogReferer(_Dimension, FastModel):
+    """
+    LogReferer is a distinct Referer header value.
+    """
+
+    __tablename__ = 'log_referers'
+
+
+class LogUserAgent(_Dimension, FastModel):
+    """
+    LogUserAgent is a distinct User-Agent header value.
+    """
+
+    __tablename__ = 'log_user_agents'
+
+
 class LogEntry(FastModel):
+    """
+    LogEntry is a single line of the access log.
+
+    Request lines, referers and user agents repeat across millions of rows, so they are stored once in
+    their own tables and referenced by id. `request`, `referer` and `user_agent` read the values through
+    relationships that are loaded together with the entry.
+
+    On PostgreSQL the table is range-partitioned by `date` (see `apps.logwriter.partitions`), with
+    ``(id, date)`` as its primary key; queries that filter on a `date` range only read the partitions
+    they touch.
+
+    Attributes:
+        id (int): Unique identifier for the entry.
+        ip (str): Client address; ``LogEntry.ip.between(*network_range("10.0.0.0/8"))`` selects a network.
+        host (str, optional): Client host name, when Apache logged one instead of the address
+            (``HostnameLookups On``); `ip` is None then.
+        date (datetime): Time the request was received, with its UTC offset.
+        request_id (int, optional): Reference to the request line.
+        referer_id (int, optional): Reference to the Referer header; None when absent.
+        user_agent_id (int, optional): Reference to the User-Agent header; None when absent.
+        status (int): Response status code.
+        size (int): Response size in bytes.
+    """
+
     __tablename__ = 'log_entries'
-    id = Column(Integer, primary_key=True)
-    ip = Column(String, index=True)
-    date = Column(DateTime, index=True, server_default=func.now())
-    request = Column(String)
+    # date and ip filters are combined with each other and with status (see apps.logwriter.queries)
+    __table_args__ = (
+        Index('ix_log_entries_date_status', 'date', 'status'),
+        Index('ix_log_entries_ip_date', 'ip', 'date'),
+    )
+
+    # bigserial, the table outgrows int4 ids; SQLite only autoincrements an INTEGER primary key
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    ip = Column(IPAddress)
+    host = Column(String)
+    date = Column(UTCDateTime, nullable=False, server_default=func.now())
+    request_id = Column(Integer, ForeignKey('log_requests.id'), index=True)
+    referer_id = Column(Integer, ForeignKey('log_referers.id'))
+    user_agent_id = Column(Integer, ForeignKey('log_user_agents.id'))
     status = Column(Integer)
-    size = Column(Integer)
\ No newline at end of file
+    size = Column(Integer)
+
+    log_request = relationship(LogRequest, lazy="joined")
+    log_referer = relationship(LogReferer, lazy="joined")
+    log_user_agent = relationship(LogUserAgent, lazy="joined")
+
+    request = association_proxy(
+        "log_request", "value", creator=lambda value: LogRequest(value=value, **split_request(value))
+    )
+    referer = association_proxy("log_referer", "value", creator=lambda value: LogReferer(value=value))
+    user_agent = association_proxy("log_user_agent", "value", creator=lambda value: LogUserAgent(value=value))
+
+
+class LogRollup(FastModel):
+    """
+    LogRollup holds the traffic aggregates of one time bucket and status code.
+
+    Rows exist for three granularities (minute, hour and day buckets, aligned on UTC) and are kept up to
+    date by the ingest path (see `apps.logwriter.rollups`), so traffic over time is read from here instead
+    of from log_entries.
+
+    Attributes:
+        id (int): Unique identifier for the row.
+        granularity (str): "minute", "hour" or "day".
+        bucket (datetime): Start of the bucket.
+        status (int): Response status code; 0 when the log format has none.
+        hits (int): Number of requests.
+        bytes (int): Sum of the response sizes.
+        ip_sketch (bytes): HyperLogLog registers of the client addresses; sketches of several rows merge
+            into the estimate of their distinct addresses.
+    """
+
+    __tablename__ = 'log_rollups'
+    __table_args__ = (UniqueConstraint('granularity', 'bucket', 'status'),)
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(6), nullable=False)
+    bucket = Column(UTCDateTime, nullable=False)
+    status = Column(Integer, nullable=False)
+    hits = Column(BigInteger, nullable=False)
+    bytes = Column(BigInteger, nullable=False)
+    ip_sketch = Column(LargeBinary, nullable=False)
+
+
+class LogFileCheckpoint(FastModel):
+    """
+    LogFileCheckpoint remembers how far a log file has been ingested.
+
+    A file is identified by its (device, inode) pair, so a logrotate rename keeps its checkpoint and
+    only updates `path`. The fingerprint of the already ingested prefix detects truncation and inode reuse.
+
+    Attributes:
+        id (int): Unique identifier for the checkpoint.
+        device (int): st_dev of the file.
+        inode (int): st_ino of the file.
+        path (str): Path the file was last seen at.
+        offset (int): Byte offset just past the last committed line, in decompressed bytes.
+        fingerprint (str): SHA-1 of the first bytes of the file, up to `offset`.
+        file_size (int, optional): Size of the file on disk when it was last read to its end; None while
+            it is partly ingested.
+        updated_at (datetime): Timestamp of the last committed progress.
+    """
+
+    __tablename__ = 'log_file_checkpoints'
+    __table_args__ = (UniqueConstraint('device', 'inode'),)
+
+    id = Column(Integer, primary_key=True)
+    device = Column(BigInteger, nullable=False)
+    inode = Column(BigInteger, nullable=False)
+    path = Column(String, nullable=False, index=True)
+    offset = Column(BigInteger, nullable=False, default=0)
+    fingerprint = Column(String(40), nullable=False, index=True)
+    file_size = Column(BigInteger, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class RejectedLogLine(FastModel):
+    """
+    RejectedLogLine keeps a log line that could not be parsed, so the import can go on without it.
+
+    Attributes:
+        id (int): Unique identifier for the rejected line.
+        path (str): Path of the file the line was read from.
+        offset (int): Byte offset of the start of the line, in decompressed bytes.
+        reason (str): Why the line was rejected.
+        line (str): The line itself, truncated to `Quarantine.max_line_length` characters.
+        created_at (datetime): Timestamp indicating when the line was rejected.
+    """
+
+    __tablename__ = 'rejected_log_lines'
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)
+    offset = Column(BigInteger, nullable=False)
+    reason = Column(String, nullable=False)
+    line = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
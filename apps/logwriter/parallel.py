@@ -0,0 +1,178 @@
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from apps.logwriter.log_format import get_log_format
+from apps.logwriter.quarantine import Quarantine
+from apps.logwriter.reader import LogFile, last_line_end, open_log
+from apps.logwriter.writer import FIELDS
+
+
+def split_ranges(path: str, start: int, end: int, chunk_size: int) -> Iterator[tuple[int, int]]:
+    """
+    Split ``[start, end)`` of a file into byte ranges of about `chunk_size` that end on a newline.
+    """
+
+    with open(path, "rb") as file:
+        while start < end:
+            stop = start + chunk_size
+            if stop < end:
+                file.seek(stop)
+                file.readline()
+                stop = file.tell()
+            stop = min(stop, end)
+            yield start, stop
+            start = stop
+
+
+def read_chunks(log_file: LogFile, chunk_size: int) -> Iterator[tuple[int, bytes]]:
+    """
+    Read a (possibly compressed) file from its offset in chunks of about `chunk_size` that end on a newline.
+
+    Yields:
+        Pairs of the decompressed offset a chunk starts at and the chunk itself.
+    """
+
+    start = log_file.offset
+    with open_log(log_file.path) as file:
+        file.seek(start)
+        while True:
+            try:
+                data = file.read(chunk_size) + file.readline()
+            except EOFError:
+                return
+            if not data.endswith(b"\n"):
+                data = data[:data.rfind(b"\n") + 1]
+            if not data:
+                return
+            yield start, data
+            start += len(data)
+
+
+class _ChunkLines:
+    # like LogFile, over a chunk already in memory: `offset` is just past the last yielded line
+    def __init__(self, data: bytes, offset: int, encoding: str):
+        self.data = data
+        self.offset = offset
+        self.line_offset = offset
+        self.encoding = encoding
+
+    def __iter__(self) -> Iterator[str]:
+        # the chunk ends with a newline, so the last element is always empty
+        for line in self.data.split(b"\n")[:-1]:
+            self.line_offset = self.offset
+            self.offset += len(line) + 1
+            yield line.decode(self.encoding, "replace")
+
+
+def parse_chunk(data: bytes, start: int, log_format: str, encoding: str) -> tuple[list[dict], array, list]:
+    """
+    Parse a newline-terminated chunk of log data that starts at offset `start` of its file.
+
+    Returns:
+        The parsed rows; for every row, the offset its line ends at, so a batch can be checkpointed
+        after any row; and ``(offset, reason, line)`` for every line that could not be parsed.
+    """
+
+    lines = _ChunkLines(data, start, encoding)
+    rows, ends, rejects = [], array("q"), []
+
+    def reject(line, error):
+        rejects.append((lines.line_offset, error.reason, line))
+
+    for row in get_log_format(log_format).parse_lines(lines, FIELDS, reject):
+        rows.append(row)
+        ends.append(lines.offset)
+    return rows, ends, rejects
+
+
+def _parse_range(path: str, log_format: str, start: int, stop: int, encoding: str) -> tuple[list[dict], array, list]:
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(stop - start)
+    return parse_chunk(data, start, log_format, encoding)
+
+
+class ParallelParser:
+    """
+    Parses log files on a pool of worker processes.
+
+    Each file is cut into newline-aligned byte ranges that are parsed concurrently; workers read plain
+    files themselves, compressed files are decompressed here and shipped as chunks. Results are handed
+    back strictly in file order, and at most ``2 * workers`` ranges are in flight, so a slow writer
+    holds back the pool instead of piling parsed rows up in memory.
+
+    Attributes:
+        log_format (str): The Apache LogFormat string, compiled once per worker.
+        workers (int): Number of worker processes.
+        chunk_size (int): Approximate size of a byte range in bytes.
+
+    Example Usage:
+        with ParallelParser(settings.log_format, workers=8) as parallel:
+            log_file = LogFile(path, checkpoint.offset)
+            writer.write(parallel.parse(log_file, quarantine))
+            advance_checkpoint(checkpoint, log_file.offset)
+    """
+
+    def __init__(self, log_format: str, workers: int, chunk_size: int = 16 * 1024 * 1024):
+        self.log_format = log_format
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(cancel_futures=True)
+        self._executor = None
+
+    def parse(self, log_file: LogFile, quarantine: Quarantine) -> Iterator[dict]:
+        """
+        Parse a log file from its offset up to the last complete line.
+
+        `log_file.offset` is kept just past the line of the last row handed out, as with sequential reading,
+        and malformed lines are handed to the quarantine as the rows around them are.
+
+        Args:
+            log_file: The file to parse and the offset to start at.
+            quarantine: Receives the lines that cannot be parsed.
+
+        Returns:
+            An iterator over parsed rows, in file order.
+        """
+
+        tasks = self._tasks(log_file)
+        pending = deque()
+
+        def submit():
+            for stop, function, *args in tasks:
+                pending.append((stop, self._executor.submit(function, *args)))
+                return
+
+        for _ in range(2 * self.workers):
+            submit()
+        while pending:
+            stop, future = pending.popleft()
+            rows, ends, rejects = future.result()
+            submit()
+            rejects = deque(rejects)
+            for row, end in zip(rows, ends):
+                while rejects and rejects[0][0] < end:
+                    quarantine.add(log_file.path, *rejects.popleft())
+                log_file.offset = end
+                yield row
+            for reject in rejects:
+                quarantine.add(log_file.path, *reject)
+            log_file.offset = stop
+
+    def _tasks(self, log_file: LogFile) -> Iterator[tuple]:
+        if log_file.compressed:
+            for start, data in read_chunks(log_file, self.chunk_size):
+                yield start + len(data), parse_chunk, data, start, self.log_format, log_file.encoding
+        else:
+            end = last_line_end(log_file.path)
+            for start, stop in split_ranges(log_file.path, log_file.offset, end, self.chunk_size):
+                yield stop, _parse_range, log_file.path, self.log_format, start, stop, log_file.encoding
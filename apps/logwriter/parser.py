@@ -1,22 +1,91 @@
 import os
-from datetime import datetime
+import re
+from contextlib import nullcontext
+from typing import Iterable, Iterator
 from sqlalchemy.orm import Session
-from apps.logwriter.models import LogEntry
-
-def parse_log_line(line, log_format):
-    parts = line.split()
-    ip = parts[0]
-    date = datetime.strptime(parts[3][1:], "%d/%b/%Y:%H:%M:%S")
-    request = " ".join(parts[5:8])
-    status = int(parts[8])
-    size = int(parts[9])
-    return LogEntry(ip=ip, date=date, request=request, status=status, size=size)
-
-def parse_logs(db: Session, settings):
-    for filename in os.listdir(settings.files_dir):
-        if filename.endswith(settings.file_extension):
-            with open(os.path.join(settings.files_dir, filename), 'r') as file:
-                for line in file:
-                    log_entry = parse_log_line(line, settings.log_format)
-                    db.add(log_entry)
-    db.commit()
+from apps.logwriter.checkpoints import advance_checkpoint, get_checkpoint, is_exhausted, is_recorded_at_end
+from apps.logwriter.log_format import get_log_format
+from apps.logwriter.metrics import IngestMetrics
+from apps.logwriter.parallel import ParallelParser
+from apps.logwriter.quarantine import Quarantine
+from apps.logwriter.reader import LogFile
+from apps.logwriter.writer import FIELDS, LogEntryWriter
+
+
+def log_files(settings) -> list[str]:
+    # access.log plus its rotations: access.log.1, access.log.2.gz, access.log-20240101.bz2, ...
+    pattern = re.compile(re.escape(settings.file_extension) + r"([.-].*)?$")
+    return sorted(
+        os.path.join(settings.files_dir, filename)
+        for filename in os.listdir(settings.files_dir)
+        if pattern.search(filename)
+    )
+
+def _batch(rows: Iterator[dict], log_file: LogFile, max_rows: int, max_bytes: int) -> Iterator[dict]:
+    start = log_file.offset
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count >= max_rows or log_file.offset - start >= max_bytes:
+            return
+
+def ingest_rows(db: Session, writer: LogEntryWriter, quarantine: Quarantine, checkpoint, log_file: LogFile,
+                rows: Iterable[dict], settings):
+    """
+    Write the rows of one file in transactions of at most `settings.batch_rows` rows or
+    `settings.batch_bytes` bytes of input.
+
+    Each transaction also moves the file checkpoint to the end of its last line and stores the lines
+    rejected on the way, so a crash loses at most the batch in flight and the next run resumes right
+    after the last committed one. Once the file is read to its end the checkpoint records that too, even
+    when no line was new, so a finished archive is not decompressed again.
+    """
+
+    rows = iter(rows)
+    while writer.write(_batch(rows, log_file, settings.batch_rows, settings.batch_bytes)):
+        _commit(db, writer.metrics, quarantine, checkpoint, log_file.offset)
+    # lines rejected after the last row still move the checkpoint
+    if log_file.offset != checkpoint.offset or not is_recorded_at_end(checkpoint):
+        _commit(db, writer.metrics, quarantine, checkpoint, log_file.offset, at_end=True)
+
+def _commit(db: Session, metrics: IngestMetrics, quarantine: Quarantine, checkpoint, offset: int,
+            at_end: bool = False):
+    read = offset - checkpoint.offset
+    with metrics.timer("commit"):
+        quarantine.flush()
+        advance_checkpoint(checkpoint, offset, at_end)
+        db.commit()
+    metrics.add("bytes_read", read)
+    metrics.add("batches")
+    metrics.set("lines_rejected", quarantine.count)
+    metrics.report()
+
+def parse_logs(db: Session, settings, workers: int = None, metrics: IngestMetrics = None):
+    """
+    Ingest every log file of `settings.files_dir` from its checkpoint on.
+
+    Progress is counted and timed in `metrics`, which is reported after every batch and once more,
+    as final, when all files are done.
+    """
+
+    workers = workers or settings.ingest_workers
+    log_format = get_log_format(settings.log_format)
+    writer = LogEntryWriter(db, metrics=metrics, partition_interval=settings.partition_interval,
+                            columnar_dir=settings.columnar_dir)
+    quarantine = Quarantine(db)
+    with ParallelParser(settings.log_format, workers) if workers > 1 else nullcontext() as parallel:
+        for path in log_files(settings):
+            checkpoint = get_checkpoint(db, path)
+            log_file = LogFile(path, checkpoint.offset)
+            if is_exhausted(checkpoint, log_file):
+                if checkpoint in db.new:
+                    # a copy of a finished archive, recorded without reading it
+                    db.commit()
+                continue
+            writer.metrics.add("files")
+            if parallel:
+                rows = parallel.parse(log_file, quarantine)
+            else:
+                rows = log_format.parse_lines(log_file, FIELDS, quarantine.rejecter(log_file))
+            ingest_rows(db, writer, quarantine, checkpoint, log_file, rows, settings)
+    quarantine.report()
+    writer.metrics.report(final=True)
@@ -0,0 +1,208 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Connection, text
+from sqlalchemy.orm import Session
+
+PARENT = "log_entries"
+DEFAULT_PARTITION = f"{PARENT}_default"
+
+# seconds creating a partition waits for a table lock before it fails instead of stalling the writer
+CREATE_LOCK_TIMEOUT = 10
+
+# interval -> format of the period start in partition names
+INTERVALS = {
+    "day": "%Y%m%d",
+    "week": "%Y%m%d",
+    "month": "%Y%m",
+}
+
+_PARTITION_RE = re.compile(rf"{PARENT}_(default|p\d{{6}}(\d\d)?)")
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def is_partition(table_name: str) -> bool:
+    return _PARTITION_RE.fullmatch(table_name) is not None
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """
+    Start of the partition period containing `moment`; periods are aligned on UTC midnight, weeks start
+    on Monday. A naive `moment` is taken as UTC.
+    """
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    day = moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_end(start: datetime, interval: str) -> datetime:
+    if interval == "week":
+        return start + timedelta(days=7)
+    if interval == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+class LogPartitions:
+    """
+    Range partitions of ``log_entries`` by ``date`` on PostgreSQL.
+
+    Partitions cover one `interval` each and are named after their first day (``log_entries_p20240101``).
+    Rows outside every partition land in ``log_entries_default``; creating a partition moves its rows out
+    of it, so a late backfill ends up partitioned too. On other databases, or before the partitioning
+    migration, ``log_entries`` is a plain table and every method is a no-op.
+
+    Partitions that already exist are remembered, so `ensure` only touches the catalog for new periods and
+    can be called for every batch written. New partitions are created and committed in a short transaction
+    of their own, on another connection than `db`: attaching one locks the default partition, which must
+    not stay locked until a long ingest transaction commits, and a partition created for a batch that is
+    rolled back is merely empty. That transaction waits for the default partition, so `db` must not hold a
+    lock on it when `ensure` is called; `CREATE_LOCK_TIMEOUT` turns a mistake into an error, not a hang.
+
+    Attributes:
+        db (Session): Session whose transaction partitions are dropped in.
+        interval (str): "day", "week" or "month". Changing it only affects periods without a partition yet.
+
+    Example Usage:
+        partitions = LogPartitions(db)
+        partitions.ensure(now, now + timedelta(days=7))
+        partitions.drop_before(now - timedelta(days=90))
+        db.commit()
+    """
+
+    def __init__(self, db: Session, interval: str = "day"):
+        if interval not in INTERVALS:
+            raise ValueError(f"Unsupported partition interval {interval!r}, expected one of {', '.join(INTERVALS)}")
+        self.db = db
+        self.interval = interval
+        self._enabled = None
+        self._covered = set()
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            self._enabled = self.db.get_bind().dialect.name == "postgresql" and self.db.execute(text(
+                "SELECT EXISTS (SELECT FROM pg_partitioned_table WHERE partrelid = to_regclass(:parent))"
+            ), {"parent": PARENT}).scalar()
+        return self._enabled
+
+    def partitions(self, connection: Connection = None) -> list[tuple[str, datetime, datetime]]:
+        """
+        Return the range partitions as ``(name, start, end)``, oldest first; the default one is left out.
+        They are read through `connection` if given, `db` otherwise.
+        """
+
+        rows = (connection or self.db).execute(text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:parent)"
+        ), {"parent": PARENT})
+        partitions = []
+        for name, bound in rows:
+            match = _BOUND_RE.search(bound)
+            if match:
+                start, end = (datetime.fromisoformat(value) for value in match.groups())
+                partitions.append((name, start, end))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def ensure(self, first: datetime, last: datetime) -> list[str]:
+        """
+        Create the missing partitions for every period between `first` and `last`, both included.
+
+        Returns:
+            The names of the partitions created.
+        """
+
+        if not self.enabled:
+            return []
+        starts = [period_start(first, self.interval)]
+        last = period_start(last, self.interval)
+        while starts[-1] < last:
+            starts.append(period_end(starts[-1], self.interval))
+        if self._covered.issuperset(starts):
+            return []
+
+        created = []
+        with self.db.get_bind().engine.begin() as connection:
+            # concurrent writers need the same partitions: the first creates them, the others then see them
+            connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:parent))"), {"parent": PARENT})
+            connection.execute(text(f"SET LOCAL lock_timeout = '{CREATE_LOCK_TIMEOUT}s'"))
+            existing = self.partitions(connection)
+            for start in starts:
+                end = period_end(start, self.interval)
+                if any(start < other_end and other_start < end for _, other_start, other_end in existing):
+                    # already partitioned, possibly with another interval
+                    continue
+                name = f"{PARENT}_p{start.strftime(INTERVALS[self.interval])}"
+                self._create(connection, name, start, end)
+                existing.append((name, start, end))
+                created.append(name)
+        self._covered.update(starts)
+        return created
+
+    @staticmethod
+    def _create(connection: Connection, name: str, start: datetime, end: datetime):
+        bounds = {"start": start, "end": end}
+        connection.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        # rows written before the partition existed are in the default partition, which must not overlap it
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), bounds)
+        connection.execute(text(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+
+    def drop_before(self, cutoff: datetime) -> list[str]:
+        """
+        Drop the partitions that only hold rows older than `cutoff`: retention without a mass DELETE.
+
+        Returns:
+            The names of the partitions dropped.
+        """
+
+        if not self.enabled:
+            return []
+        if cutoff.tzinfo is None:
+            cutoff = cutoff.replace(tzinfo=timezone.utc)
+        dropped = []
+        for name, start, end in self.partitions():
+            if end <= cutoff:
+                self.drop(name, start)
+                dropped.append(name)
+        return dropped
+
+    def drop(self, name: str, start: datetime):
+        """
+        Detach and drop the partition `name` starting at `start`, with all its rows.
+        """
+
+        self.db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        self.db.execute(text(f"DROP TABLE {name}"))
+        self._covered.discard(start)
+
+
+def maintain_partitions(db: Session, settings, now: datetime = None) -> tuple[list[str], list[str]]:
+    """
+    Create the partitions of the next `settings.partitions_ahead` days and, if `settings.retention_days` is
+    set, drop the partitions older than that. Rows left in the default partition are not affected.
+
+    Returns:
+        The names of the partitions created and of those dropped.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    partitions = LogPartitions(db, settings.partition_interval)
+    created = partitions.ensure(now, now + timedelta(days=settings.partitions_ahead))
+    dropped = []
+    if settings.retention_days:
+        dropped = partitions.drop_before(now - timedelta(days=settings.retention_days))
+    db.commit()
+    return created, dropped
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from sqlalchemy.orm import Session
+
+from apps.logwriter.checkpoints import advance_checkpoint, get_checkpoint, is_exhausted, is_recorded_at_end
+from apps.logwriter.metrics import IngestMetrics
+from apps.logwriter.parallel import parse_chunk, read_chunks
+from apps.logwriter.parser import log_files
+from apps.logwriter.quarantine import Quarantine
+from apps.logwriter.reader import LogFile
+from apps.logwriter.writer import LogEntryWriter
+
+# end-of-stream marker passed down the queues
+_DONE = None
+
+
+class _FileEnd:
+    # passed down the queues after the last chunk of a file; set once the file's batches are committed
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self.committed = asyncio.Event()
+
+
+async def _run_stages(*stages):
+    # like a TaskGroup: the first failure cancels the other stages and is re-raised
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class IngestPipeline:
+    """
+    Ingests the files in FILES_DIR through an asyncio pipeline: reader -> parser pool -> batcher -> writer.
+
+    Reading runs in threads, parsing on a pool of worker processes and database writes on a single
+    dedicated thread that owns the session, so disk I/O, parsing and commits of consecutive chunks overlap.
+    The queues between stages are bounded: when the database falls behind, parsing and then reading wait
+    for it instead of buffering the file in memory. Awaiting `run()` never blocks the event loop, so it
+    can run as an `AsyncIOScheduler` job next to the API.
+
+    Batches are made of whole chunks and, like `parse_logs`, commit the rows together with the file
+    checkpoint once `settings.batch_rows` rows or `settings.batch_bytes` bytes have been collected.
+    Files are taken one after the other: the next one is opened once the batches of the previous one are
+    committed, so its checkpoint lookup sees them (a compressed copy of a file ingested in the same run is
+    recognised and skipped). Chunks of the same file still overlap.
+
+    Stages are timed in `metrics`: ``read`` in the reader threads, ``parse`` as the time the batcher waits
+    for the parser pool, ``encode``/``write``/``commit`` on the database thread. A stage that takes most of
+    the time is the bottleneck the others are waiting for.
+
+    Attributes:
+        db (Session): Session used for writing; only ever touched from the database thread.
+        settings: Apache configuration (`ApacheConfig.get_config()`).
+        workers (int): Number of parser processes.
+        queue_size (int): Capacity of the read and write queues, in chunks and batches.
+        chunk_size (int): Approximate size of a chunk handed to a parser process, in bytes.
+        metrics (IngestMetrics): Counters and stage timers, reported after every batch.
+
+    Example Usage:
+        with Session(DatabaseManager.engine) as db:
+            await IngestPipeline(db, ApacheConfig.get_config()).run()
+    """
+
+    def __init__(self, db: Session, settings, workers: int = None, queue_size: int = 4,
+                 chunk_size: int = 4 * 1024 * 1024, metrics: IngestMetrics = None):
+        self.db = db
+        self.settings = settings
+        self.workers = workers or settings.ingest_workers
+        self.queue_size = queue_size
+        self.chunk_size = min(chunk_size, settings.batch_bytes)
+        self.metrics = metrics or IngestMetrics()
+        self.writer = LogEntryWriter(db, metrics=self.metrics, partition_interval=settings.partition_interval,
+                                     columnar_dir=settings.columnar_dir)
+        self.quarantine = Quarantine(db)
+
+    async def run(self):
+        chunks = asyncio.Queue(self.queue_size)
+        parsed = asyncio.Queue(2 * self.workers)
+        batches = asyncio.Queue(self.queue_size)
+        # spawned workers: forking a process that runs the API event loop and its threads is not safe
+        pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+        database = ThreadPoolExecutor(1, thread_name_prefix="ingest-db")
+        loop = asyncio.get_running_loop()
+        try:
+            await _run_stages(
+                self._read(chunks, database),
+                self._parse(chunks, parsed, pool),
+                self._batch(parsed, batches),
+                self._write(batches, database),
+            )
+        finally:
+            # rolling back and waiting for the executors block, so not on the event loop either
+            try:
+                await loop.run_in_executor(database, self.db.rollback)
+            finally:
+                await asyncio.to_thread(database.shutdown)
+                await asyncio.to_thread(pool.shutdown)
+        self.quarantine.report()
+        self.metrics.report(final=True)
+
+    async def _read(self, chunks: asyncio.Queue, database: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        for path in log_files(self.settings):
+            checkpoint, log_file = await loop.run_in_executor(database, self._open, path)
+            if log_file is None:
+                continue
+            reader = read_chunks(log_file, self.chunk_size)
+            while (chunk := await asyncio.to_thread(self._next_chunk, reader)) is not None:
+                start, data = chunk
+                await chunks.put((checkpoint, log_file, start, data))
+            file_end = _FileEnd(checkpoint)
+            await chunks.put(file_end)
+            await file_end.committed.wait()
+        await chunks.put(_DONE)
+
+    async def _parse(self, chunks: asyncio.Queue, parsed: asyncio.Queue, pool: ProcessPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while (item := await chunks.get()) is not _DONE:
+            if isinstance(item, _FileEnd):
+                await parsed.put(item)
+                continue
+            checkpoint, log_file, start, data = item
+            future = loop.run_in_executor(
+                pool, parse_chunk, data, start, self.settings.log_format, log_file.encoding
+            )
+            await parsed.put((checkpoint, log_file.path, start + len(data), len(data), future))
+        await parsed.put(_DONE)
+
+    async def _batch(self, parsed: asyncio.Queue, batches: asyncio.Queue):
+        rows, rejects, size, current, end = [], [], 0, None, None
+        while (item := await parsed.get()) is not _DONE:
+            if isinstance(item, _FileEnd):
+                # a batch never spans two files
+                if size:
+                    await batches.put((current, rows, rejects, end))
+                    rows, rejects, size = [], [], 0
+                await batches.put(item)
+                continue
+            checkpoint, path, stop, length, future = item
+            started = time.perf_counter()
+            chunk_rows, _, chunk_rejects = await future
+            self.metrics.record("parse", time.perf_counter() - started)
+            rows.extend(chunk_rows)
+            rejects.extend((path, *reject) for reject in chunk_rejects)
+            size += length
+            current, end = checkpoint, stop
+            if len(rows) >= self.settings.batch_rows or size >= self.settings.batch_bytes:
+                await batches.put((current, rows, rejects, end))
+                rows, rejects, size = [], [], 0
+        if size:
+            await batches.put((current, rows, rejects, end))
+        await batches.put(_DONE)
+
+    async def _write(self, batches: asyncio.Queue, database: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while (item := await batches.get()) is not _DONE:
+            if isinstance(item, _FileEnd):
+                await loop.run_in_executor(database, self._finish, item.checkpoint)
+                item.committed.set()
+                continue
+            await loop.run_in_executor(database, self._commit, *item)
+
+    def _next_chunk(self, reader) -> tuple | None:
+        # runs in a reader thread
+        with self.metrics.timer("read"):
+            return next(reader, None)
+
+    # the methods below run on the database thread
+
+    def _open(self, path: str) -> tuple:
+        checkpoint = get_checkpoint(self.db, path)
+        log_file = LogFile(path, checkpoint.offset)
+        if is_exhausted(checkpoint, log_file):
+            if checkpoint in self.db.new:
+                # a copy of a finished archive, recorded without reading it
+                self.db.commit()
+            return checkpoint, None
+        self.metrics.add("files")
+        return checkpoint, log_file
+
+    def _commit(self, checkpoint, rows: list[dict], rejects: list[tuple], end: int):
+        read = end - checkpoint.offset
+        self.writer.write(rows)
+        with self.metrics.timer("commit"):
+            for reject in rejects:
+                self.quarantine.add(*reject)
+            self.quarantine.flush()
+            advance_checkpoint(checkpoint, end)
+            self.db.commit()
+        self.metrics.add("bytes_read", read)
+        self.metrics.add("batches")
+        self.metrics.set("lines_rejected", self.quarantine.count)
+        self.metrics.report()
+
+    def _finish(self, checkpoint):
+        # the last batch ended at the last complete line; a file without new lines is recorded as read too
+        if not is_recorded_at_end(checkpoint):
+            advance_checkpoint(checkpoint, checkpoint.offset, at_end=True)
+            self.db.commit()
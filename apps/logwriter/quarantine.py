@@ -0,0 +1,76 @@
+import logging
+from typing import Callable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from apps.logwriter.log_format import LogFormatError
+from apps.logwriter.models import RejectedLogLine
+
+
+class Quarantine:
+    """
+    Collects log lines that cannot be parsed and stores them in ``rejected_log_lines``.
+
+    Rejected lines are kept in memory until `flush()`, which inserts them in the caller's transaction,
+    so they are committed (or lost) together with the batch they were read in.
+
+    Attributes:
+        db (Session): The session rejected lines are written with.
+        count (int): Number of lines rejected since the quarantine was created.
+        max_line_length (int): Longer lines are truncated before being stored.
+
+    Example Usage:
+        quarantine = Quarantine(db)
+        rows = log_format.parse_lines(log_file, FIELDS, quarantine.rejecter(log_file))
+        ...
+        quarantine.flush()
+        db.commit()
+    """
+
+    max_line_length = 8192
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.count = 0
+        self._pending = []
+
+    def add(self, path: str, offset: int, reason: str, line: str):
+        self.count += 1
+        self._pending.append({
+            "path": path,
+            "offset": offset,
+            "reason": reason,
+            "line": line[:self.max_line_length].rstrip("\n").replace("\x00", "\ufffd"),
+        })
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of lines rejected since the last flush.
+        """
+
+        return len(self._pending)
+
+    def rejecter(self, log_file) -> Callable[[str, LogFormatError], None]:
+        """
+        Return a `LogFormat.parse_lines` reject callback for lines read from `log_file`.
+        """
+
+        def reject(line: str, error: LogFormatError):
+            self.add(log_file.path, log_file.line_offset, error.reason, line)
+
+        return reject
+
+    def flush(self):
+        """
+        Insert the lines rejected since the last flush.
+        """
+
+        if self._pending:
+            self.db.execute(insert(RejectedLogLine.__table__), self._pending)
+            self._pending = []
+
+    def report(self):
+        if self.count:
+            logging.warning(f"{self.count} malformed log lines moved to {RejectedLogLine.__tablename__}")
@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from apps.logwriter.archive import read_archive
+from apps.logwriter.models import LogEntry, LogRequest, network_range
+from config.database import run_blocking
+
+
+def day_range(first: date, last: date = None) -> tuple[datetime, datetime]:
+    """
+    Return the half-open ``[start, end)`` timestamp range covering the UTC days `first` to `last`, both
+    included (only `first` if `last` is not given), as aware datetimes to compare with the ``timestamptz``
+    column.
+
+    Comparing ``LogEntry.date`` itself with such a range, instead of casting it to a date, keeps the
+    predicate sargable: PostgreSQL can use the date indexes and skip the partitions outside the range.
+    """
+
+    last = last or first
+    return (
+        datetime(first.year, first.month, first.day, tzinfo=timezone.utc),
+        datetime(last.year, last.month, last.day, tzinfo=timezone.utc) + timedelta(days=1),
+    )
+
+
+def filter_log_entries(query: Query, start_date: date = None, end_date: date = None, ip: str = None,
+                       status: int = None) -> Query:
+    """
+    Add the usual log filters to a ``LogEntry`` query; filters left as None are not applied.
+
+    Args:
+        query: A query selecting from ``log_entries``.
+        start_date: The first day, or the only day when `end_date` is None.
+        end_date: The last day, included.
+        ip: An address or a CIDR block such as ``10.0.0.0/8``; raises ValueError when invalid.
+        status: Response status code.
+
+    Returns:
+        The filtered query. Every predicate compares a bare column, so the ``(date, status)`` and
+        ``(ip, date)`` indexes can find the matching rows; the rows themselves are still read from the table.
+
+    Example Usage:
+        logs = filter_log_entries(db.query(LogEntry), date(2024, 6, 10), ip="10.0.0.0/8").all()
+    """
+
+    if start_date:
+        start, end = day_range(start_date, end_date)
+        query = query.filter(LogEntry.date >= start, LogEntry.date < end)
+    if ip:
+        query = query.filter(LogEntry.ip.between(*network_range(ip)))
+    if status:
+        query = query.filter(LogEntry.status == status)
+    return query
+
+
+def find_log_entries(db: Session, start_date: date = None, end_date: date = None, ip: str = None,
+                     status: int = None, archive_dir: str = None) -> list:
+    """
+    Return the log entries matching the filters of `filter_log_entries`, including the archived ones in
+    `archive_dir` when the days reach back into the archive.
+
+    Returns:
+        Archived entries (`ArchivedLogEntry`) first, oldest first, then the ``LogEntry`` rows.
+    """
+
+    entries = filter_log_entries(db.query(LogEntry), start_date, end_date, ip, status).all()
+    if start_date and archive_dir:
+        entries = run_blocking(read_archive, archive_dir, *day_range(start_date, end_date), ip, status) + entries
+    return entries
+
+
+def find_by_path(db: Session, path: str, method: str = None) -> list[LogEntry]:
+    """
+    Return the log entries whose request path (without query string) is `path`, optionally only those
+    with the request method `method`.
+    """
+
+    requests = db.query(LogRequest.id).filter(LogRequest.path == path)
+    if method:
+        requests = requests.filter(LogRequest.method == method)
+    return db.query(LogEntry).filter(LogEntry.request_id.in_(requests.scalar_subquery())).all()
+
+
+def top_paths(db: Session, limit: int = 10) -> list:
+    """
+    Return the `limit` most requested paths as ``(path, hits)`` rows, most requested first.
+    """
+
+    # count by request_id first (from its index alone), then roll the request lines up into paths
+    hits = (
+        db.query(LogEntry.request_id, func.count().label("hits"))
+        .group_by(LogEntry.request_id)
+        .subquery()
+    )
+    total = func.sum(hits.c.hits)
+    return (
+        db.query(LogRequest.path, total.label("hits"))
+        .join(hits, hits.c.request_id == LogRequest.id)
+        .filter(LogRequest.path.isnot(None))
+        .group_by(LogRequest.path)
+        .order_by(total.desc())
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,127 @@
+import bz2
+import gzip
+import io
+import lzma
+from typing import BinaryIO, Iterator
+
+# decompressed data is read in large blocks, lines are split out of the buffer
+READ_BUFFER_SIZE = 1024 * 1024
+
+# magic number -> opener; detected from content, whatever the file is called
+_COMPRESSED = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+
+
+def _opener(path: str):
+    with open(path, "rb") as file:
+        magic = file.read(6)
+    for prefix, opener in _COMPRESSED:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+def is_compressed(path: str) -> bool:
+    return _opener(path) is not None
+
+
+def open_log(path: str) -> BinaryIO:
+    """
+    Open a log file for binary reading, streaming gzip, bzip2 and xz content through a decompressor.
+
+    Offsets and seeks on the returned file are in decompressed bytes. Seeking a compressed file forward
+    decompresses and discards, seeking backwards restarts decompression from the beginning.
+    """
+
+    opener = _opener(path)
+    if opener is None:
+        return open(path, "rb", buffering=READ_BUFFER_SIZE)
+    return io.BufferedReader(opener(path, "rb"), buffer_size=READ_BUFFER_SIZE)
+
+
+class LogFile:
+    """
+    Iterates the complete lines of a log file starting at a byte offset.
+
+    `offset` always points just past the last line handed out, so it can be stored as a checkpoint once
+    those lines are committed. A trailing line without a newline is still being written by Apache and is
+    left for the next run.
+
+    By default the file is reopened on every iteration. After `open()` the handle is kept, so reads keep
+    following the same inode even after the path has been renamed or unlinked.
+
+    Compressed files (see `open_log`) are decompressed on the fly and `offset` counts decompressed bytes.
+    A compressed stream that ends early (still being written by logrotate) ends the iteration.
+
+    Attributes:
+        path (str): Path of the log file.
+        offset (int): Byte offset just past the last yielded line.
+        line_offset (int): Byte offset of the start of the last yielded line.
+        encoding (str): Encoding used to decode lines; undecodable bytes are replaced.
+        compressed (bool): Whether the file is gzip, bzip2 or xz compressed.
+
+    Example Usage:
+        log_file = LogFile(path, checkpoint.offset)
+        for line in log_file:
+            ...
+        checkpoint.offset = log_file.offset
+    """
+
+    def __init__(self, path: str, offset: int = 0, encoding: str = "utf-8"):
+        self.path = path
+        self.offset = offset
+        self.line_offset = offset
+        self.encoding = encoding
+        self.compressed = is_compressed(path)
+        self._file = None
+
+    def open(self):
+        self._file = open_log(self.path)
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self) -> Iterator[str]:
+        if self._file is not None:
+            yield from self._lines(self._file)
+        else:
+            with open_log(self.path) as file:
+                yield from self._lines(file)
+
+    def _lines(self, file: BinaryIO) -> Iterator[str]:
+        # a no-op seek still rewinds a decompressor, so only seek when the position is off
+        if file.tell() != self.offset:
+            file.seek(self.offset)
+        try:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                self.line_offset = self.offset
+                self.offset += len(line)
+                yield line.decode(self.encoding, "replace")
+        except EOFError:
+            pass
+
+
+def last_line_end(path: str, block_size: int = 64 * 1024) -> int:
+    """
+    Return the byte offset just past the last newline of an uncompressed file, or 0 if it has none.
+    """
+
+    with open(path, "rb") as file:
+        position = file.seek(0, 2)
+        while position > 0:
+            start = max(0, position - block_size)
+            file.seek(start)
+            block = file.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                return start + newline + 1
+            position = start
+    return 0
@@ -0,0 +1,244 @@
+import hashlib
+import math
+from datetime import date, datetime, time, timezone
+from itertools import islice
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogEntry, LogRollup
+
+# granularity -> bucket width in minutes
+GRANULARITIES = {
+    "minute": 1,
+    "hour": 60,
+    "day": 1440,
+}
+
+# HyperLogLog with 2**9 one-byte registers: 512 bytes per row, about 4.6% standard error
+SKETCH_BITS = 9
+SKETCH_SIZE = 1 << SKETCH_BITS
+_RANK_BITS = 64 - SKETCH_BITS
+
+_UPSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _ip_hash(ip: str) -> int:
+    return int.from_bytes(hashlib.blake2b(ip.encode(), digest_size=8).digest(), "big")
+
+
+def merge_sketches(first: bytes, second: bytes) -> bytearray:
+    return bytearray(np.maximum(np.frombuffer(first, np.uint8), np.frombuffer(second, np.uint8)))
+
+
+def estimate_distinct(sketch: bytes) -> int:
+    """
+    Estimate the number of distinct values added to a HyperLogLog sketch.
+    """
+
+    alpha = 0.7213 / (1 + 1.079 / SKETCH_SIZE)
+    estimate = alpha * SKETCH_SIZE * SKETCH_SIZE / sum(2.0 ** -register for register in sketch)
+    zeros = sketch.count(0)
+    if estimate <= 2.5 * SKETCH_SIZE and zeros:
+        # linear counting is more accurate while many registers are still empty
+        estimate = SKETCH_SIZE * math.log(SKETCH_SIZE / zeros)
+    return round(estimate)
+
+
+def _bucket(minute: int) -> datetime:
+    return datetime.fromtimestamp(minute * 60, timezone.utc)
+
+
+def _minute(moment: datetime) -> int:
+    # SQLite returns stored timestamps without their offset
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) // 60
+
+
+def _utc_days(first: date, last: date = None) -> tuple[datetime, datetime]:
+    last = last or first
+    start = datetime.combine(first, time(), timezone.utc)
+    return start, _bucket(_minute(datetime.combine(last, time(), timezone.utc)) + GRANULARITIES["day"])
+
+
+class Rollups:
+    """
+    Maintains ``log_rollups`` from batches of ingested rows.
+
+    A batch is aggregated in memory per minute and status first, then rolled up into hours and days, and
+    each granularity is merged into the table with one upsert: counters are added in SQL, IP sketches are
+    merged with the stored ones. The rows belong to the caller's transaction, so they are committed
+    together with the entries they count.
+
+    Two writers updating the same bucket concurrently always get the counters right, but the sketch of
+    the one that commits last wins, which makes the distinct-IP estimate of that bucket a bit low. Both
+    lock and upsert rows in (granularity, bucket, status) order, so they wait for each other instead of
+    deadlocking.
+
+    Attributes:
+        db (Session): The session whose transaction the rollups are written in.
+
+    Example Usage:
+        rollups = Rollups(db)
+        rollups.add(rows)
+        db.commit()
+    """
+
+    table = LogRollup.__table__
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._ip_hashes = {}
+
+    def add(self, rows: Iterable[dict]):
+        """
+        Count rows into the rollups.
+
+        Args:
+            rows: Dicts with ``date`` (aware datetime), ``ip``, ``status`` and ``size``.
+        """
+
+        ip_hashes = self._ip_hashes
+        if len(ip_hashes) > 1_000_000:
+            ip_hashes.clear()
+        minutes = {}
+        for row in rows:
+            key = (_minute(row["date"]), row["status"] or 0)
+            aggregate = minutes.get(key)
+            if aggregate is None:
+                aggregate = minutes[key] = [0, 0, bytearray(SKETCH_SIZE)]
+            aggregate[0] += 1
+            aggregate[1] += row["size"] or 0
+            ip = row["ip"]
+            if ip:
+                value = ip_hashes.get(ip)
+                if value is None:
+                    value = ip_hashes[ip] = _ip_hash(ip)
+                sketch = aggregate[2]
+                index = value >> _RANK_BITS
+                rank = _RANK_BITS - (value & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+                if rank > sketch[index]:
+                    sketch[index] = rank
+        if not minutes:
+            return
+
+        for granularity, width in GRANULARITIES.items():
+            if width == 1:
+                buckets = minutes
+            else:
+                buckets = {}
+                for (minute, status), (hits, size, sketch) in minutes.items():
+                    key = (minute - minute % width, status)
+                    aggregate = buckets.get(key)
+                    if aggregate is None:
+                        buckets[key] = [hits, size, sketch]
+                    else:
+                        aggregate[0] += hits
+                        aggregate[1] += size
+                        aggregate[2] = merge_sketches(aggregate[2], sketch)
+            self._upsert(granularity, buckets)
+
+    def _upsert(self, granularity: str, buckets: dict):
+        table = self.table
+        # rows are locked as they are returned, so in this order; granularities come in GRANULARITIES order
+        stored = self.db.execute(
+            select(table.c.bucket, table.c.status, table.c.ip_sketch)
+            .where(table.c.granularity == granularity)
+            .where(table.c.bucket.in_(sorted({_bucket(minute) for minute, _ in buckets})))
+            .order_by(table.c.bucket, table.c.status)
+            .with_for_update()
+        )
+        sketches = {key: sketch for key, (_, _, sketch) in buckets.items()}
+        for bucket, status, sketch in stored:
+            key = (_minute(bucket), status)
+            if key in sketches:
+                sketches[key] = merge_sketches(sketches[key], sketch)
+
+        insert = _UPSERTS[self.db.get_bind().dialect.name](table)
+        self.db.execute(
+            insert.on_conflict_do_update(
+                index_elements=["granularity", "bucket", "status"],
+                set_={
+                    "hits": table.c.hits + insert.excluded.hits,
+                    "bytes": table.c.bytes + insert.excluded.bytes,
+                    "ip_sketch": insert.excluded.ip_sketch,
+                },
+            ),
+            [
+                {"granularity": granularity, "bucket": _bucket(minute), "status": status, "hits": hits,
+                 "bytes": size, "ip_sketch": bytes(sketches[minute, status])}
+                for (minute, status), (hits, size, _) in sorted(buckets.items(), key=lambda item: item[0])
+            ],
+        )
+
+
+def rebuild_rollups(db: Session, first: date, last: date = None, batch_size: int = 100_000) -> int:
+    """
+    Recompute the rollups of the UTC days `first` to `last` (both included) from ``log_entries``, e.g.
+    after a backfill that bypassed the ingest path. Rows ingested into those days meanwhile may be
+    counted twice, so run it while nothing is being ingested for them.
+
+    Returns:
+        The number of entries rolled up.
+    """
+
+    start, end = _utc_days(first, last)
+    db.execute(delete(LogRollup).where(LogRollup.bucket >= start, LogRollup.bucket < end))
+    rows = db.execute(
+        select(LogEntry.date, LogEntry.ip, LogEntry.status, LogEntry.size)
+        .where(LogEntry.date >= start, LogEntry.date < end)
+        .execution_options(yield_per=batch_size)
+    ).mappings()
+    rollups = Rollups(db)
+    count = 0
+    while batch := list(islice(rows, batch_size)):
+        rollups.add(batch)
+        count += len(batch)
+    db.commit()
+    return count
+
+
+def read_traffic(db: Session, granularity: str, first: date, last: date = None, status: int = None) -> list[dict]:
+    """
+    Read the traffic of the UTC days `first` to `last` (both included) from the rollups.
+
+    Returns:
+        One dict per bucket, oldest first, with ``bucket``, ``hits``, ``bytes``, ``ips`` (estimated
+        distinct client addresses) and ``statuses`` (hits per status code).
+
+    Raises:
+        ValueError: If `granularity` is unknown.
+    """
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity {granularity!r}, expected one of {', '.join(GRANULARITIES)}")
+    start, end = _utc_days(first, last)
+    query = (
+        select(LogRollup.bucket, LogRollup.status, LogRollup.hits, LogRollup.bytes, LogRollup.ip_sketch)
+        .where(LogRollup.granularity == granularity, LogRollup.bucket >= start, LogRollup.bucket < end)
+        .order_by(LogRollup.bucket, LogRollup.status)
+    )
+    if status is not None:
+        query = query.where(LogRollup.status == status)
+
+    traffic = {}
+    for row in db.execute(query):
+        minute = _minute(row.bucket)
+        bucket = traffic.get(minute)
+        if bucket is None:
+            bucket = traffic[minute] = {"bucket": _bucket(minute), "hits": 0, "bytes": 0,
+                                        "ips": bytearray(SKETCH_SIZE), "statuses": {}}
+        bucket["hits"] += row.hits
+        bucket["bytes"] += row.bytes
+        bucket["ips"] = merge_sketches(bucket["ips"], row.ip_sketch)
+        bucket["statuses"][row.status] = row.hits
+    for bucket in traffic.values():
+        bucket["ips"] = estimate_distinct(bucket["ips"])
+    return list(traffic.values())
@@ -1,48 +1,105 @@
-from fastapi import APIRouter, Query
-from sqlalchemy import cast, Date
-from apps.logwriter.models import LogEntry
-from config.database import DatabaseManager
-from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from apps.logwriter.columns import GROUPS, MEASURES, ColumnStore, aggregate
+from apps.logwriter.models import LogEntry, network_range
+from apps.logwriter.queries import filter_log_entries, find_by_path, find_log_entries, top_paths
+from apps.logwriter.rollups import GRANULARITIES, read_traffic
+from apps.logwriter.schemas import LogEntryResponse, PathHitsResponse, StatsResponse, TrafficResponse
+from config.database import DatabaseManager, SessionRunner
+from config.settings import ApacheConfig
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter(tags=['Логи'])
 
 
-@router.get("/logs/", summary="Прочитать логи")
-def read_logs(skip: int = 0, limit: int = 10):
-    return DatabaseManager.session.query(LogEntry).offset(skip).limit(limit).all()
+@router.get("/logs/", response_model=list[LogEntryResponse], summary="Прочитать логи")
+async def read_logs(skip: int = 0, limit: int = 10, db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
+    return await db.run(lambda session: session.query(LogEntry).offset(skip).limit(limit).all())
 
 
-@router.get("/logs/ip/{ip}", summary="Получить логи по IP")
-def read_logs_by_ip(ip: str):
-    return DatabaseManager.session.query(LogEntry).filter(LogEntry.ip == ip).all()
+@router.get("/logs/ip/{ip:path}", response_model=list[LogEntryResponse], summary="Получить логи по IP или подсети")
+async def read_logs_by_ip(ip: str, db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
+    # a single address or a CIDR block such as /logs/ip/10.0.0.0/8
+    try:
+        return await db.run(lambda session: filter_log_entries(session.query(LogEntry), ip=ip).all())
+    except ValueError:
+        return JSONResponse({"error": "Incorrect IP address or network, should be like 10.0.0.1 or 10.0.0.0/8"})
 
 
-@router.get("/logs/date/", summary="Получить логи по дате")
-def read_logs_by_date(date: str = Query(..., description="Формат даты dd.mm.yyyy")):
+@router.get("/logs/date/", response_model=list[LogEntryResponse], summary="Получить логи по дате")
+async def read_logs_by_date(date: str = Query(..., description="Формат даты dd.mm.yyyy"),
+    db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
     try:
         date_obj = datetime.strptime(date, "%d.%m.%Y")
     except ValueError:
-        return {"error": "Incorrect date format, should be dd.mm.yyyy"}
-    return (
-        DatabaseManager.session.query(LogEntry)
-        .filter(cast(LogEntry.date, Date) == date_obj)
-        .all()
-    )
+        return JSONResponse({"error": "Incorrect date format, should be dd.mm.yyyy"})
+    return await db.run(find_log_entries, date_obj, archive_dir=ApacheConfig.get_config().archive_dir)
 
 
-@router.get("/logs/date-range/", summary="Получить логи по временному промежутку")
-def read_logs_by_date_range(start_date: str = Query(..., description="Формат даты dd.mm.yyyy"),
-    end_date: str = Query(..., description="Формат даты dd.mm.yyyy")):
+@router.get("/logs/date-range/", response_model=list[LogEntryResponse], summary="Получить логи по временному промежутку")
+async def read_logs_by_date_range(start_date: str = Query(..., description="Формат даты dd.mm.yyyy"),
+    end_date: str = Query(..., description="Формат даты dd.mm.yyyy"),
+    db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
     try:
         start_date_obj = datetime.strptime(start_date, "%d.%m.%Y")
     except ValueError:
-        return {"error": "Incorrect date format, should be dd.mm.yyyy"}
+        return JSONResponse({"error": "Incorrect date format, should be dd.mm.yyyy"})
     try:
         end_date_obj = datetime.strptime(end_date, "%d.%m.%Y")
     except ValueError:
-        return {"error": "Incorrect date format, should be dd.mm.yyyy"}
-    return (
-        DatabaseManager.session.query(LogEntry)
-        .filter(cast(LogEntry.date, Date).between(start_date_obj, end_date_obj))
-        .all()
-    )
+        return JSONResponse({"error": "Incorrect date format, should be dd.mm.yyyy"})
+    return await db.run(find_log_entries, start_date_obj, end_date_obj,
+                        archive_dir=ApacheConfig.get_config().archive_dir)
+
+
+@router.get("/logs/path/", response_model=list[LogEntryResponse], summary="Получить логи по пути запроса")
+async def read_logs_by_path(path: str = Query(..., description="Путь без строки запроса, например /index.html"),
+    method: str = Query(None, description="Метод запроса, например GET"),
+    db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
+    return await db.run(find_by_path, path, method)
+
+
+@router.get("/logs/paths/top/", response_model=list[PathHitsResponse], summary="Самые запрашиваемые пути")
+async def read_top_paths(limit: int = 10, db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
+    return await db.run(top_paths, limit)
+
+
+@router.get("/logs/traffic/", response_model=list[TrafficResponse], summary="Трафик по минутам, часам или дням")
+async def read_logs_traffic(start_date: str = Query(..., description="Формат даты dd.mm.yyyy"),
+    end_date: str = Query(None, description="Формат даты dd.mm.yyyy, по умолчанию равна start_date"),
+    granularity: str = Query("hour", description="minute, hour или day"),
+    status: int = Query(None, description="Код ответа, например 404"),
+    db: SessionRunner = Depends(DatabaseManager.get_read_runner)):
+    try:
+        start_date_obj = datetime.strptime(start_date, "%d.%m.%Y")
+        end_date_obj = datetime.strptime(end_date, "%d.%m.%Y") if end_date else None
+    except ValueError:
+        return JSONResponse({"error": "Incorrect date format, should be dd.mm.yyyy"})
+    if granularity not in GRANULARITIES:
+        return JSONResponse({"error": f"Incorrect granularity, should be one of {', '.join(GRANULARITIES)}"})
+    # served from log_rollups, without touching log_entries
+    return await db.run(read_traffic, granularity, start_date_obj, end_date_obj, status)
+
+
+@router.get("/logs/stats/", response_model=list[StatsResponse], summary="Хиты или байты по статусу, часу, дню, IP или запросу")
+async def read_logs_stats(by: str = Query("status", description="status, hour, day, ip или request_id"),
+    measure: str = Query("hits", description="hits или bytes"),
+    days: int = Query(7, description="За сколько последних дней"),
+    ip: str = Query(None, description="Адрес или подсеть, например 10.0.0.0/8"),
+    status: int = Query(None, description="Код ответа, например 404")):
+    settings = ApacheConfig.get_config()
+    if not settings.columnar_dir:
+        return JSONResponse({"error": "The column store is disabled, set LOG_COLUMNAR_DIR"})
+    if by not in GROUPS or measure not in MEASURES:
+        return JSONResponse({"error": f"Incorrect grouping, should be one of {', '.join(GROUPS)} "
+                                      f"and one of {', '.join(MEASURES)}"})
+    if ip:
+        try:
+            network_range(ip)
+        except ValueError:
+            return JSONResponse({"error": "Incorrect IP address or network, should be like 10.0.0.1 or 10.0.0.0/8"})
+    end = datetime.now(timezone.utc)
+    # served from memory-mapped column files, without touching the database
+    return await run_in_threadpool(aggregate, ColumnStore(settings.columnar_dir), end - timedelta(days=days),
+                                   end, by, measure, ip, status)
@@ -1,14 +1,39 @@
 from pydantic import BaseModel
 
 from datetime import datetime
+from typing import Optional, Union
 
 
 class LogEntryResponse(BaseModel):
-    ip: str
+    ip: Optional[str]
+    host: Optional[str] = None
     date: datetime
-    request: str
+    request: Optional[str]
+    referer: Optional[str]
+    user_agent: Optional[str]
     status: int
     size: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class PathHitsResponse(BaseModel):
+    path: str
+    hits: int
+
+    class Config:
+        orm_mode = True
+
+
+class TrafficResponse(BaseModel):
+    bucket: datetime
+    hits: int
+    bytes: int
+    ips: int
+    statuses: dict[int, int]
+
+
+class StatsResponse(BaseModel):
+    key: Union[int, datetime, str]
+    value: int
@@ -1,12 +1,65 @@
+import asyncio
+
+from sqlalchemy.orm import Session
 from apps.scheduler import scheduler
 from config.database import DatabaseManager
 from apscheduler.triggers.cron import CronTrigger
-from apps.logwriter.parser import parse_logs
+from apps.logwriter.archive import archive_logs
+from apps.logwriter.columns import prune_columns
+from apps.logwriter.follow import LogFollower
+from apps.logwriter.metrics import ingest_metrics
+from apps.logwriter.partitions import maintain_partitions
+from apps.logwriter.pipeline import IngestPipeline
 from config.settings import ApacheConfig
 
 every_day_trigger = CronTrigger(hour=0, minute=0)
 
 
 @scheduler.scheduled_job(trigger=every_day_trigger)
-def parse_logs_every_day():
-    parse_logs(DatabaseManager.session, ApacheConfig.get_config())
\ No newline at end of file
+async def parse_logs_every_day():
+    settings = ApacheConfig.get_config()
+    if settings.follow_logs:
+        # the follower already keeps log_entries current
+        return
+    db = Session(DatabaseManager.engine)
+    try:
+        await IngestPipeline(db, settings, metrics=ingest_metrics(settings)).run()
+    finally:
+        # closing returns the connection to the pool, which may block
+        await asyncio.to_thread(db.close)
+
+
+def manage_partitions():
+    with Session(DatabaseManager.engine) as db:
+        maintain_partitions(db, ApacheConfig.get_config())
+
+
+def archive_old_logs():
+    with Session(DatabaseManager.engine) as db:
+        archive_logs(db, ApacheConfig.get_config())
+
+
+def prune_column_store():
+    prune_columns(ApacheConfig.get_config())
+
+
+def follow_logs():
+    with Session(DatabaseManager.engine) as db:
+        LogFollower(db, ApacheConfig.get_config()).run(lambda: not scheduler.running)
+
+
+if ApacheConfig.get_config().follow_logs:
+    # runs once, right after the scheduler starts, until the scheduler shuts down
+    scheduler.add_job(follow_logs, id="follow_logs", replace_existing=True, misfire_grace_time=None)
+
+# before midnight, so the next day's partition exists when its first lines arrive
+scheduler.add_job(manage_partitions, trigger=CronTrigger(hour=23, minute=0), id="manage_partitions",
+                  replace_existing=True)
+
+# after the nightly import, outside of peak hours
+scheduler.add_job(archive_old_logs, trigger=CronTrigger(hour=3, minute=0), id="archive_old_logs",
+                  replace_existing=True)
+
+# the column store only serves recent days
+scheduler.add_job(prune_column_store, trigger=CronTrigger(hour=3, minute=30), id="prune_column_store",
+                  replace_existing=True)
@@ -0,0 +1,219 @@
+import io
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterable
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from apps.logwriter.columns import ColumnStore
+from apps.logwriter.metrics import IngestMetrics
+from apps.logwriter.models import LogEntry, LogReferer, LogRequest, LogUserAgent, value_hash
+from apps.logwriter.partitions import LogPartitions
+from apps.logwriter.rollups import Rollups
+
+# fields every parsed row must provide
+FIELDS = ("ip", "host", "date", "request", "referer", "user_agent", "status", "size")
+
+# log_entries columns filled by the ingest path, in COPY order
+COLUMNS = ("ip", "host", "date", "request_id", "referer_id", "user_agent_id", "status", "size")
+
+# escapes required by the COPY text format
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(_COPY_ESCAPES)
+    return str(value)
+
+
+class Dictionary:
+    """
+    An in-process cache of a dimension table (`LogRequest`, `LogReferer`, `LogUserAgent`).
+
+    Values missing from the cache are inserted in bulk (ignoring those another writer inserted first)
+    and their ids read back, so each distinct value costs one round trip per writer instead of one per row.
+    The inserts belong to the caller's transaction, so a cache must not outlive a rollback.
+
+    Attributes:
+        table (Table): The dimension table.
+        ids (dict): Cached value -> id mapping; `nulls` map to None.
+        max_size (int): The cache is cleared when it grows past this many values.
+    """
+
+    def __init__(self, model, nulls: tuple = (), max_size: int = 1_000_000):
+        self.table = model.__table__
+        self.split = model.split
+        self.nulls = dict.fromkeys((None, *nulls))
+        self.ids = dict(self.nulls)
+        self.max_size = max_size
+
+    def resolve(self, db: Session, values: set) -> dict:
+        """
+        Make sure all `values` are cached, inserting the new ones.
+
+        Returns:
+            The value -> id cache.
+        """
+
+        ids = self.ids
+        missing = [value for value in values if value not in ids]
+        if not missing:
+            return ids
+        if len(ids) + len(missing) > self.max_size:
+            ids.clear()
+            ids.update(self.nulls)
+            # the values of this batch that were cached are gone too
+            missing = [value for value in values if value not in ids]
+
+        insert_ignore = _INSERTS[db.get_bind().dialect.name]
+        for start in range(0, len(missing), 1000):
+            hashes = {value_hash(value): value for value in missing[start:start + 1000]}
+            db.execute(
+                insert_ignore(self.table).on_conflict_do_nothing(index_elements=["hash"]),
+                [{"hash": hash, "value": value, **self.split(value)} for hash, value in hashes.items()],
+            )
+            found = db.execute(select(self.table.c.hash, self.table.c.id).where(self.table.c.hash.in_(hashes)))
+            for hash, id in found:
+                ids[hashes[hash]] = id
+        return ids
+
+
+class LogEntryWriter:
+    """
+    Writes parsed log rows into ``log_entries`` without building ``LogEntry`` instances.
+
+    Rows are written in batches of `batch_size`. The request line, referer and user agent of a batch are
+    first swapped for the ids of their dimension rows (see `Dictionary`). Then the batch is loaded with
+    a single ``COPY ... FROM STDIN`` on PostgreSQL (psycopg2), or one ``executemany`` insert through
+    SQLAlchemy Core on other databases. Rows are written inside the session's current transaction,
+    committing is left to the caller.
+
+    When ``log_entries`` is partitioned, the partitions a batch falls in are created before it is loaded,
+    and committed at once on a connection of their own (see `LogPartitions`).
+    Every batch written is also counted into the traffic rollups (see `Rollups`).
+
+    Pulling rows from `rows` (reading and parsing), resolving dimension ids and loading are timed as the
+    ``parse``, ``encode``, ``write`` and ``rollup`` (rollups and column store) stages of `metrics`.
+
+    Attributes:
+        db (Session): The session whose connection and transaction are used.
+        batch_size (int): Rows per COPY or ``executemany`` call.
+        use_copy (bool): Load through COPY (PostgreSQL with psycopg2).
+        use_executemany (bool): Load through the DBAPI ``executemany`` (SQLite), with the parameters encoded
+            column by column by SQLAlchemy's own type processors instead of row by row by ``Session.execute``.
+        partitions (LogPartitions): Partitions of ``log_entries``.
+        rollups (Rollups): Traffic aggregates updated with every batch.
+        columns (ColumnStore): Columnar copy of the entries, committed with `db`; None unless `columnar_dir`
+            is given.
+        metrics (IngestMetrics): Where stage timings and ``lines_parsed``/``rows_written`` are counted.
+
+    Example Usage:
+        writer = LogEntryWriter(db)
+        writer.write({"ip": ..., "date": ..., "request": ..., "status": ..., ...} for ... in ...)
+        db.commit()
+    """
+
+    table = LogEntry.__table__
+
+    def __init__(self, db: Session, batch_size: int = 10_000, metrics: IngestMetrics = None,
+                 partition_interval: str = "day", columnar_dir: str = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.partitions = LogPartitions(db, partition_interval)
+        self.rollups = Rollups(db)
+        self.columns = None
+        if columnar_dir:
+            self.columns = ColumnStore(columnar_dir)
+            self.columns.bind(db)
+        self.metrics = metrics or IngestMetrics()
+        dialect = db.get_bind().dialect
+        self.use_copy = dialect.name == "postgresql" and dialect.driver == "psycopg2"
+        self.use_executemany = dialect.name == "sqlite"
+        self._processors = [self.table.c[column].type.dialect_impl(dialect).bind_processor(dialect)
+                            for column in COLUMNS]
+        # (row field, log_entries column, dictionary); Apache logs "-" for a missing header
+        self.dictionaries = (
+            ("request", "request_id", Dictionary(LogRequest)),
+            ("referer", "referer_id", Dictionary(LogReferer, nulls=("-",))),
+            ("user_agent", "user_agent_id", Dictionary(LogUserAgent, nulls=("-",))),
+        )
+
+    def write(self, rows: Iterable[dict]) -> int:
+        """
+        Write rows to the database.
+
+        Args:
+            rows: Dicts keyed by the names in ``FIELDS``; consumed lazily, one batch at a time.
+
+        Returns:
+            The number of rows written.
+        """
+
+        metrics = self.metrics
+        written = 0
+        rows = iter(rows)
+        while True:
+            with metrics.timer("parse"):
+                batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return written
+            metrics.add("lines_parsed", len(batch))
+            with metrics.timer("encode"):
+                self._encode(batch)
+                if self.partitions.enabled:
+                    dates = [row["date"] for row in batch]
+                    self.partitions.ensure(min(dates), max(dates))
+            with metrics.timer("write"):
+                if self.use_copy:
+                    self._copy(batch)
+                elif self.use_executemany:
+                    self._executemany(batch)
+                else:
+                    self.db.execute(insert(self.table), batch)
+            with metrics.timer("rollup"):
+                self.rollups.add(batch)
+                if self.columns:
+                    self.columns.append(batch)
+            metrics.add("rows_written", len(batch))
+            written += len(batch)
+
+    def _encode(self, batch: list[dict]):
+        # `date` is the partition key and NOT NULL; a format without %t gets the database default, now()
+        now = None
+        for row in batch:
+            if row["date"] is None:
+                row["date"] = now = now or datetime.now(timezone.utc)
+        for field, column, dictionary in self.dictionaries:
+            ids = dictionary.resolve(self.db, {row[field] for row in batch})
+            for row in batch:
+                row[column] = ids[row[field]]
+
+    def _copy(self, batch: list[dict]):
+        data = "".join(["\t".join([_copy_field(row[column]) for column in COLUMNS]) + "\n" for row in batch])
+        statement = f"COPY {self.table.name} ({', '.join(COLUMNS)}) FROM STDIN"
+        connection = self.db.connection().connection.dbapi_connection
+        with connection.cursor() as cursor:
+            cursor.copy_expert(statement, io.StringIO(data))
+
+    def _executemany(self, batch: list[dict]):
+        columns = []
+        for column, process in zip(COLUMNS, self._processors):
+            values = [row[column] for row in batch]
+            columns.append(list(map(process, values)) if process else values)
+        statement = f"INSERT INTO {self.table.name} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        connection = self.db.connection().connection.dbapi_connection
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(statement, zip(*columns))
+        finally:
+            cursor.close()
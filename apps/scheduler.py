@@ -1,10 +1,8 @@
-from sqlalchemy import URL
-
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 
+from config.database import database_url
 from config.settings import DATABASES
 
-db_config = DATABASES.copy()
-jobstores = {"default": SQLAlchemyJobStore(url=URL.create(**db_config))}
+jobstores = {"default": SQLAlchemyJobStore(url=database_url(DATABASES))}
 scheduler = AsyncIOScheduler(jobstores=jobstores, timezone="Europe/Moscow")
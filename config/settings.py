@@ -42,11 +42,39 @@ class ApacheConfig:
         files_dir: str
         file_extension: str
         log_format: str
+        ingest_workers: int
+        batch_rows: int
+        batch_bytes: int
+        follow_logs: bool
+        follow_flush_ms: int
+        follow_flush_rows: int
+        metrics_file: str | None
+        partition_interval: str
+        partitions_ahead: int
+        retention_days: int
+        archive_dir: str | None
+        archive_after_days: int
+        columnar_dir: str | None
+        columnar_days: int
 
     config = _ApacheConfig(
         files_dir=os.getenv("FILES_DIR"),
         file_extension=os.getenv("FILE_EXTENSION"),
-        log_format=os.getenv("LOG_FORMAT")
+        log_format=os.getenv("LOG_FORMAT"),
+        ingest_workers=int(os.getenv("INGEST_WORKERS", 1)),
+        batch_rows=int(os.getenv("INGEST_BATCH_ROWS", 50000)),
+        batch_bytes=int(os.getenv("INGEST_BATCH_MB", 64)) * 1024 * 1024,
+        follow_logs=os.getenv("FOLLOW_LOGS", "False").lower() == "true",
+        follow_flush_ms=int(os.getenv("FOLLOW_FLUSH_MS", 1000)),
+        follow_flush_rows=int(os.getenv("FOLLOW_FLUSH_ROWS", 10000)),
+        metrics_file=os.getenv("INGEST_METRICS_FILE"),
+        partition_interval=os.getenv("LOG_PARTITION_INTERVAL", "day"),
+        partitions_ahead=int(os.getenv("LOG_PARTITIONS_AHEAD", 7)),
+        retention_days=int(os.getenv("LOG_RETENTION_DAYS", 0)),
+        archive_dir=os.getenv("LOG_ARCHIVE_DIR"),
+        archive_after_days=int(os.getenv("LOG_ARCHIVE_AFTER_DAYS", 0)),
+        columnar_dir=os.getenv("LOG_COLUMNAR_DIR"),
+        columnar_days=int(os.getenv("LOG_COLUMNAR_DAYS", 31)),
     )
 
     @classmethod
@@ -90,8 +118,10 @@ class EmailServiceConfig:
 # --- Database Settings ---
 # -------------------------
 
+# DB_DRIVER=sqlite runs on an embedded database file, DB_NAME, relative to the project root; the other
+# connection settings are then unused
 DATABASES = {
-    "drivername": "postgresql",
+    "drivername": os.getenv("DB_DRIVER", "postgresql"),
     "username": os.getenv("DB_USERNAME"),
     "password": os.getenv("DB_PASSWORD"),
     "host": os.getenv("DB_HOST"),
@@ -99,6 +129,37 @@ DATABASES = {
     "port": int(os.getenv("DB_PORT", 5432))
 }
 
+# connection pool of each process (uvicorn worker); sync routes run in a threadpool of 40 threads,
+# so pool_size + max_overflow = 40 lets every thread hold a connection
+DATABASE_POOL = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 30)),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "True").lower() == "true",
+}
+
+# serve API requests through an asyncio engine (asyncpg) instead of the threadpool
+DATABASE_ASYNC = os.getenv("DB_ASYNC", "False").lower() == "true"
+
+# read replicas for the read-only endpoints, as SQLAlchemy URLs; a replica lagging more than
+# DATABASE_REPLICA_MAX_LAG seconds behind the primary is skipped until it catches up
+DATABASE_REPLICAS = os.getenv("DB_REPLICA_URLS", "").split()
+DATABASE_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 30))
+
+# pragmas of every SQLite connection: WAL lets the API read while logs are written, and with it
+# synchronous=NORMAL only syncs at checkpoints (a power loss may lose the last commits, never corrupts);
+# the page cache and the memory map are per connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": -int(os.getenv("DB_SQLITE_CACHE_MB", 64)) * 1024,
+    "mmap_size": int(os.getenv("DB_SQLITE_MMAP_MB", 1024)) * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": int(os.getenv("DB_SQLITE_BUSY_TIMEOUT", 5000)),
+    "foreign_keys": "ON",
+}
+
 # ----------------------
 # --- Cors Settings ---
 # ----------------------
@@ -1,6 +1,12 @@
+import gzip
+import math
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+import click
+import numpy as np
+
 def generate_random_ip():
     return ".".join(str(random.randint(0, 255)) for _ in range(4))
 
@@ -26,5 +32,237 @@ def generate_logs(filename, num_lines):
             log_line = generate_log_line()
             file.write(log_line + '\n')
 
+
+# --- realistic corpora ---
+
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+_SECONDS = np.array([f"{second:02d}" for second in range(60)], dtype=object)
+
+_STATUSES = np.array(("200", "304", "301", "302", "404", "403", "500", "503"), dtype=object)
+_STATUS_WEIGHTS = np.cumsum((86, 6, 2, 2, 2.5, 0.5, 0.7, 0.3))
+
+_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.{v} Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_{v} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{v}.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:{v}.0) Gecko/20100101 Firefox/{v}.0",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+    "Mozilla/5.0 (compatible; YandexBot/3.{v}; +http://yandex.com/bots)",
+    "curl/8.{v}.0",
+    "python-requests/2.{v}.0",
+    "-",
+)
+
+_PROBES = ("/wp-login.php", "/.env", "/phpmyadmin/", "/.git/config", "/xmlrpc.php", "/admin.php", "/cgi-bin/test.cgi")
+
+
+def _zipf(count: int, exponent: float = 1.1) -> np.ndarray:
+    # cumulative weights: rank 1 is the most popular
+    return np.cumsum(1 / np.arange(1, count + 1) ** exponent)
+
+
+def _draw(rng: np.random.Generator, cum_weights: np.ndarray, count: int) -> np.ndarray:
+    # indices of `count` values drawn with the given cumulative weights, like random.choices
+    return np.searchsorted(cum_weights, rng.random(count) * cum_weights[-1], side="right")
+
+
+def _random_ip(rng: random.Random) -> str:
+    if rng.random() < 0.04:
+        return f"2001:db8:{rng.randrange(65536):x}::{rng.randrange(1, 65536):x}"
+    return f"{rng.randint(1, 223)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randint(1, 254)}"
+
+
+class _Pools:
+    # clients, requests, referers and user agents, ordered by popularity; identical for a given seed. Values
+    # are object arrays, so a whole minute of them is picked with one array of drawn indices
+    def __init__(self, seed: int, num_ips: int = 50_000, num_requests: int = 5_000):
+        rng = random.Random(seed)
+        self.ips = np.array([_random_ip(rng) for _ in range(num_ips)], dtype=object)
+        self.ip_weights = _zipf(num_ips, 1.2)
+
+        # (request line, response size, always 404)
+        requests = [("GET / HTTP/1.1", 11_213, False), ("GET /index.html HTTP/1.1", 11_213, False),
+                    ("GET /favicon.ico HTTP/1.1", 1_150, False), ("GET /robots.txt HTTP/1.1", 68, False)]
+        words = ("apache", "logs", "python", "release", "docs", "pricing", "support", "linux", "cloud", "api")
+        while len(requests) < num_requests:
+            kind = rng.random()
+            if kind < 0.35:
+                ext = rng.choice(("css", "js", "png", "svg", "woff2"))
+                path = f"/static/{ext}/{rng.choice(words)}-{rng.getrandbits(32):08x}.{ext}"
+                requests.append((f"GET {path} HTTP/1.1", rng.randint(400, 250_000), False))
+            elif kind < 0.6:
+                path = f"/blog/{rng.choice(words)}-{rng.choice(words)}-{rng.randint(1, 999)}"
+                requests.append((f"GET {path} HTTP/1.1", rng.randint(8_000, 60_000), False))
+            elif kind < 0.75:
+                path = f"/products/{rng.randint(1, 100_000)}?ref={rng.choice(words)}"
+                requests.append((f"GET {path} HTTP/2.0", rng.randint(15_000, 90_000), False))
+            elif kind < 0.85:
+                path = f"/search?q={rng.choice(words)}+{rng.choice(words)}&page={rng.randint(1, 20)}"
+                requests.append((f"GET {path} HTTP/1.1", rng.randint(5_000, 40_000), False))
+            elif kind < 0.97:
+                method = rng.choice(("GET", "GET", "GET", "POST", "PUT", "DELETE"))
+                path = f"/api/v1/{rng.choice(('users', 'orders', 'items', 'carts'))}/{rng.randint(1, 1_000_000)}"
+                requests.append((f"{method} {path} HTTP/1.1", rng.randint(50, 4_000), False))
+            else:
+                requests.append((f"GET {rng.choice(_PROBES)} HTTP/1.1", rng.randint(190, 400), True))
+        lines, sizes, probes = zip(*requests)
+        self.requests = np.array(lines, dtype=object)
+        self.request_sizes = np.array([str(size) for size in sizes], dtype=object)
+        self.request_probes = np.array(probes)
+        self.request_weights = _zipf(num_requests, 1.05)
+
+        referers = [
+            f"https://example.com/blog/{rng.choice(words)}-{rng.randint(1, 999)}" for _ in range(300)
+        ] + [f"https://www.google.com/search?q={word}" for word in words]
+        rng.shuffle(referers)
+        self.referers = np.array(["-"] + referers, dtype=object)
+        self.referer_weights = _zipf(len(self.referers), 1.3)
+
+        user_agents = [template.format(v=rng.randint(1, 130)) for template in _USER_AGENTS for _ in range(8)]
+        rng.shuffle(user_agents)
+        self.user_agents = np.array(user_agents, dtype=object)
+        self.user_agent_weights = _zipf(len(self.user_agents), 1.0)
+
+
+def _minute_counts(num_lines: int, start: datetime, days: float, seed: int) -> list[tuple[int, str | None]]:
+    """
+    Lines per minute following a diurnal curve (peak at 15:00, trough at 03:00, quieter weekends), with
+    random bursts of 3-10x traffic from a single client, scaled to exactly `num_lines`.
+    """
+
+    rng = random.Random(seed)
+    minutes = max(1, round(days * 1440))
+    weights = []
+    for minute in range(minutes):
+        moment = start + timedelta(minutes=minute)
+        day_fraction = (moment.hour * 60 + moment.minute) / 1440
+        weight = 1 + 0.8 * math.sin(2 * math.pi * (day_fraction - 0.375))
+        if moment.weekday() >= 5:
+            weight *= 0.7
+        weights.append(weight * rng.uniform(0.85, 1.15))
+
+    bursts = [None] * minutes
+    for _ in range(max(1, round(days * 2))):
+        first = rng.randrange(minutes)
+        client = _random_ip(rng)
+        multiplier = rng.uniform(3, 10)
+        for minute in range(first, min(minutes, first + rng.randint(5, 30))):
+            weights[minute] *= multiplier
+            bursts[minute] = client
+
+    scale = num_lines / sum(weights)
+    counts, expected, written = [], 0.0, 0
+    for weight, burst in zip(weights, bursts):
+        expected += weight * scale
+        count = int(expected) - written
+        written += count
+        counts.append((count, burst))
+    counts[-1] = (counts[-1][0] + num_lines - written, counts[-1][1])
+    return counts
+
+
+def _write_shard(path: str, start: datetime, counts: list, seed: int, shard: int, combined: bool,
+                 compress: bool, utc_offset: str) -> str:
+    pools = _Pools(seed)
+    rng = np.random.default_rng([seed, shard])
+    opener = (lambda name: gzip.open(name, "wt", compresslevel=1)) if compress else (lambda name: open(name, "w"))
+
+    with opener(path) as file:
+        for minute, (count, burst) in enumerate(counts):
+            if not count:
+                continue
+            moment = start + timedelta(minutes=minute)
+            prefix = (f"[{moment.day:02d}/{_MONTHS[moment.month - 1]}/{moment.year}:"
+                      f"{moment.hour:02d}:{moment.minute:02d}:")
+            suffix = f" {utc_offset}]"
+            seconds = _SECONDS[np.sort(rng.integers(0, 60, count))]
+            ips = pools.ips[_draw(rng, pools.ip_weights, count)]
+            if burst:
+                ips[rng.choice(count, count * 7 // 10, replace=False)] = burst
+            requests = _draw(rng, pools.request_weights, count)
+            statuses = _STATUSES[_draw(rng, _STATUS_WEIGHTS, count)]
+            sizes = pools.request_sizes[requests]
+            sizes[statuses == "304"] = "-"
+            # probes of missing pages always get a 404, whatever was drawn
+            statuses[pools.request_probes[requests]] = "404"
+            lines = [
+                f'{ip} - - {prefix}{second}{suffix} "{request}" {status} {size}'
+                for ip, second, request, status, size in zip(ips.tolist(), seconds.tolist(),
+                                                             pools.requests[requests].tolist(),
+                                                             statuses.tolist(), sizes.tolist())
+            ]
+            if combined:
+                referers = pools.referers[_draw(rng, pools.referer_weights, count)]
+                user_agents = pools.user_agents[_draw(rng, pools.user_agent_weights, count)]
+                lines = [f'{line} "{referer}" "{user_agent}"'
+                         for line, referer, user_agent in zip(lines, referers.tolist(), user_agents.tolist())]
+            lines.append("")
+            file.write("\n".join(lines))
+    return path
+
+
+def generate_corpus(path: str, num_lines: int, seed: int = 0, start: datetime = datetime(2024, 1, 1),
+                    days: float = 1.0, shards: int = 1, workers: int = None, combined: bool = True,
+                    compress: bool = False, utc_offset: str = "+0000") -> list[str]:
+    """
+    Generate a large, realistic access log quickly.
+
+    Clients and requests follow Zipf distributions, traffic follows a daily curve with bursts from single
+    clients, and lines carry Combined-format referers and user agents. Values are drawn as numpy arrays,
+    a minute of traffic at a time, and shards are written by separate processes.
+
+    Args:
+        path: Output file. With several shards it holds the newest one and older shards are written next
+            to it like logrotate does: path.1, path.2, ...
+        num_lines: Total number of lines.
+        seed: Random seed; the same arguments always produce the same files.
+        start: Time of the first line.
+        days: Time span covered by the corpus.
+        shards: Number of files, each covering a consecutive part of the time span.
+        workers: Processes writing shards in parallel; defaults to one per shard.
+        combined: Write the Combined LogFormat (with referer and user agent) instead of the Common one.
+        compress: Gzip the files and add a ".gz" suffix.
+        utc_offset: The ``%z`` written after every timestamp.
+
+    Returns:
+        The written paths, oldest first.
+    """
+
+    counts = _minute_counts(num_lines, start, days, seed)
+    per_shard = num_lines / shards
+    jobs, first, total = [], 0, 0
+    for minute, (count, _) in enumerate(counts):
+        total += count
+        last_minute = minute == len(counts) - 1
+        if last_minute or (total >= per_shard * (len(jobs) + 1) and len(jobs) < shards - 1):
+            index = shards - 1 - len(jobs)
+            name = (path if index == 0 else f"{path}.{index}") + (".gz" if compress else "")
+            jobs.append((name, start + timedelta(minutes=first), counts[first:minute + 1], seed, len(jobs),
+                         combined, compress, utc_offset))
+            first = minute + 1
+
+    if len(jobs) == 1:
+        return [_write_shard(*jobs[0])]
+    with ProcessPoolExecutor(workers or len(jobs)) as pool:
+        return list(pool.map(_write_shard, *zip(*jobs)))
+
+
+@click.command()
+@click.option('--output', default="apache/logs/access.log", show_default=True, help="File to write.")
+@click.option('--lines', type=int, default=1000, show_default=True, help="Number of lines.")
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option('--days', type=float, default=1.0, show_default=True, help="Time span of the traffic.")
+@click.option('--start', type=click.DateTime(), default="2024-01-01", show_default=True)
+@click.option('--shards', type=int, default=1, show_default=True, help="Files, written in parallel.")
+@click.option('--workers', type=int, default=None, help="Processes writing shards (default: one per shard).")
+@click.option('--common', is_flag=True, help="Common LogFormat, without referer and user agent.")
+@click.option('--gzip', 'compress', is_flag=True, help="Write gzip-compressed files.")
+def main(output, lines, seed, days, start, shards, workers, common, compress):
+    for path in generate_corpus(output, lines, seed, start, days, shards, workers, not common, compress):
+        click.echo(path)
+
+
 if __name__ == "__main__":
-    generate_logs("apache/logs/access.log", 1000)
+    main()
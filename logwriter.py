@@ -1,10 +1,20 @@
+import asyncio
+import json
 import click
 from sqlalchemy.orm import Session
+from apps.logwriter.archive import archive_logs
+from apps.logwriter.bench import bench_ingest, bench_parser
+from apps.logwriter.columns import ColumnStore, rebuild_columns
+from apps.logwriter.follow import LogFollower
+from apps.logwriter.metrics import ingest_metrics
+from apps.logwriter.partitions import maintain_partitions
 from apps.logwriter.parser import parse_logs
+from apps.logwriter.pipeline import IngestPipeline
+from apps.logwriter.queries import find_log_entries
+from apps.logwriter.rollups import rebuild_rollups
 from config.settings import ApacheConfig
-from sqlalchemy import cast, Date
 from config.database import DatabaseManager
-from apps.logwriter.models import LogEntry
+from apps.logwriter.models import network_range
 from datetime import datetime
 
 DatabaseManager().load()
@@ -13,25 +23,50 @@ class LogWriterCLI:
     def __init__(self):
         self.settings = ApacheConfig.get_config()
 
-    def parse(self):
+    def parse(self, workers=None, pipeline=False):
         db: Session = DatabaseManager.session
-        parse_logs(db, self.settings)
+        metrics = ingest_metrics(self.settings, progress=True)
+        if pipeline:
+            asyncio.run(IngestPipeline(db, self.settings, workers, metrics=metrics).run())
+        else:
+            parse_logs(db, self.settings, workers, metrics)
         db.close()
 
-    def view_logs(self, start_date=None, end_date=None, ip=None, status=None):
+    def follow(self):
         db: Session = DatabaseManager.session
-        query = db.query(LogEntry)
-        if start_date and end_date:
-            query = query.filter(cast(LogEntry.date, Date).between(start_date, end_date))
-        elif start_date:
-             query = query.filter(cast(LogEntry.date, Date) == start_date)
-        if ip:
-            query = query.filter(LogEntry.ip == ip)
-        if status:
-            query = query.filter(LogEntry.status == status)
-        logs = query.all()
+        try:
+            LogFollower(db, self.settings).run()
+        except KeyboardInterrupt:
+            pass
         db.close()
-        return logs
+
+    def partitions(self):
+        db: Session = DatabaseManager.session
+        created, dropped = maintain_partitions(db, self.settings)
+        db.close()
+        return created, dropped
+
+    def archive(self):
+        db: Session = DatabaseManager.session
+        archived = archive_logs(db, self.settings)
+        db.close()
+        return archived
+
+    def rollups(self, start_date, end_date=None):
+        db: Session = DatabaseManager.session
+        count = rebuild_rollups(db, start_date, end_date)
+        db.close()
+        return count
+
+    def columns(self, start_date, end_date=None):
+        db: Session = DatabaseManager.session
+        count = rebuild_columns(db, ColumnStore(self.settings.columnar_dir), start_date, end_date)
+        db.close()
+        return count
+
+    def view_logs(self, start_date=None, end_date=None, ip=None, status=None):
+        with DatabaseManager.read_session() as db:
+            return find_log_entries(db, start_date, end_date, ip, status, self.settings.archive_dir)
     
 def is_date(value, date_format="%d.%m.%Y"):
     try:
@@ -52,15 +87,54 @@ def parse():
 
 @click.command()
 @click.argument('args', nargs=-1)
-def cli(args):
+@click.option('--workers', type=int, default=None, help="Number of parser processes for 'parse'.")
+@click.option('--pipeline', is_flag=True, help="Overlap reading, parsing and writing in 'parse'.")
+@click.option('--lines', type=int, multiple=True, help="Corpus size for 'bench ingest'; repeat for several sizes.")
+@click.option('--seed', type=int, default=0, help="Corpus seed for 'bench'.")
+@click.option('--database-url', default=None, help="Scratch database for 'bench ingest' (default: temporary SQLite).")
+def cli(args, workers, pipeline, lines, seed, database_url):
     cli = LogWriterCLI()
     
     if len(args) == 0:
-        click.echo("No arguments provided. Use 'parse', or provide dates and filters.")
+        click.echo("No arguments provided. Use 'parse', 'follow', 'partitions', 'archive', 'rollups', 'columns', 'bench', or provide dates and filters.")
         return
     
     if args[0] == 'parse':
-        cli.parse()
+        cli.parse(workers, pipeline)
+    elif args[0] == 'follow':
+        cli.follow()
+    elif args[0] == 'partitions':
+        created, dropped = cli.partitions()
+        click.echo(f"Created: {', '.join(created) or '-'}")
+        click.echo(f"Dropped: {', '.join(dropped) or '-'}")
+    elif args[0] == 'archive':
+        for path in cli.archive():
+            click.echo(f"Archived: {path}")
+    elif args[0] == 'rollups':
+        if not 2 <= len(args) <= 3 or not all(is_date(arg) for arg in args[1:]):
+            click.echo("Usage: rollups DD.MM.YYYY [DD.MM.YYYY]")
+            return
+        dates = [datetime.strptime(arg, "%d.%m.%Y") for arg in args[1:]]
+        click.echo(f"Rolled up: {cli.rollups(*dates)}")
+    elif args[0] == 'columns':
+        if not 2 <= len(args) <= 3 or not all(is_date(arg) for arg in args[1:]):
+            click.echo("Usage: columns DD.MM.YYYY [DD.MM.YYYY]")
+            return
+        if not cli.settings.columnar_dir:
+            click.echo("LOG_COLUMNAR_DIR is not set")
+            return
+        dates = [datetime.strptime(arg, "%d.%m.%Y") for arg in args[1:]]
+        click.echo(f"Written: {cli.columns(*dates)}")
+    elif args[0] == 'bench':
+        if args[1:] == ('ingest',):
+            settings = cli.settings.model_copy(update={"ingest_workers": workers or cli.settings.ingest_workers})
+            result = bench_ingest(lines or (100_000,), seed, settings, database_url)
+        elif args[1:] == ('parser',):
+            result = bench_parser(lines[0] if lines else 200_000, seed=seed)
+        else:
+            click.echo("Usage: bench ingest|parser")
+            return
+        click.echo(json.dumps(result, indent=2))
     else:
         start_date = None
         end_date = None
@@ -96,9 +170,16 @@ def cli(args):
                 return
 
 
+        if ip:
+            try:
+                network_range(ip)
+            except ValueError:
+                click.echo("IP должен быть адресом или подсетью, например 10.0.0.1 или 10.0.0.0/8")
+                return
+
         logs = cli.view_logs(start_date, end_date, ip, status)
         for log in logs:
-            print(f"IP: {log.ip}, Date: {log.date}, Request: {log.request}, Status: {log.status}, Size: {log.size}")
+            print(f"IP: {log.ip or log.host}, Date: {log.date}, Request: {log.request}, Status: {log.status}, Size: {log.size}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,6 @@
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# config.settings requires its variables; the template's values fill in those the environment lacks
+load_dotenv(Path(__file__).parent.parent / ".env.template")
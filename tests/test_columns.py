@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta, timezone
+
+from apps.logwriter.columns import ColumnStore, aggregate
+
+START = datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+
+def _rows(count: int, status: int) -> list[dict]:
+    return [{"date": START + timedelta(minutes=minute), "ip": "10.0.0.1", "status": status, "size": 10,
+             "request_id": 1} for minute in range(count)]
+
+
+def test_concurrent_writers_keep_their_rows(tmp_path):
+    first, second = ColumnStore(str(tmp_path)), ColumnStore(str(tmp_path))
+    first.append(_rows(5, 200))
+    second.append(_rows(3, 404))
+    first.commit()
+    second.rollback()
+    second.append(_rows(2, 500))
+    second.commit()
+
+    day = int(START.timestamp()) // 86400
+    assert first.rows(day) == 7
+    hits = aggregate(ColumnStore(str(tmp_path)), START, START + timedelta(days=1), by="status")
+    assert hits == [{"key": 200, "value": 5}, {"key": 500, "value": 2}]
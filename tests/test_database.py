@@ -0,0 +1,37 @@
+import math
+
+import config.database
+from config.database import ReplicaSet
+
+
+def test_only_reachable_replicas_within_the_lag_serve_reads(tmp_path):
+    # SQLite cannot create a file in a directory that does not exist
+    urls = [f"sqlite:///{tmp_path / 'replica.db'}", f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"]
+    replicas = ReplicaSet(urls, max_lag=30)
+    reachable, unreachable = replicas.replicas
+
+    # not checked yet: read from the primary rather than from a replica of unknown lag
+    assert replicas.pick() is None
+    replicas.refresh()
+    assert (reachable.lag, unreachable.lag) == (0.0, math.inf)
+    assert {replicas.pick() for _ in range(4)} == {reachable}
+
+    reachable.lag = 45.0
+    assert replicas.pick() is None
+
+
+def test_replicas_are_picked_in_turn_and_rechecked_once_stale(tmp_path, monkeypatch):
+    replicas = ReplicaSet([f"sqlite:///{tmp_path / 'first.db'}", f"sqlite:///{tmp_path / 'second.db'}"], max_lag=30)
+    replicas.refresh()
+    first, second = replicas.replicas
+
+    assert [replicas.pick() for _ in range(4)] == [first, second, first, second]
+
+    first.lag = math.inf
+    assert not replicas.stale
+    replicas.refresh()
+    assert first.lag == math.inf
+    monkeypatch.setattr(config.database, "REPLICA_CHECK_INTERVAL", 0)
+    assert replicas.stale
+    replicas.refresh()
+    assert first.lag == 0.0
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from apps.logwriter.log_format import LogFormat, LogFormatError, decode_timestamp
+
+COMBINED = LogFormat('%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"')
+
+
+def test_combined_line_is_split_into_typed_fields():
+    row = COMBINED.parse('10.0.0.1 - frank [10/Oct/2000:13:55:36 -0700] "GET /a.gif HTTP/1.0" 200 2326 '
+                         '"http://example.com/" "Mozilla/4.08"\n')
+
+    assert row["ip"] == "10.0.0.1"
+    assert row["user"] == "frank"
+    assert row["request"] == "GET /a.gif HTTP/1.0"
+    assert row["status"] == 200
+    assert row["size"] == 2326
+    assert row["referer"] == "http://example.com/"
+    assert row["user_agent"] == "Mozilla/4.08"
+
+
+def test_quoted_fields_keep_escaped_quotes_and_dash_size_is_zero():
+    row = COMBINED.parse(r'10.0.0.1 - - [10/Oct/2000:13:55:36 -0700] "GET /a\"b HTTP/1.1" 304 - "-" '
+                         r'"Mozilla \"quoted\" 5.0"')
+
+    assert row["request"] == r'GET /a\"b HTTP/1.1'
+    assert row["user_agent"] == r'Mozilla \"quoted\" 5.0'
+    assert row["size"] == 0
+
+
+def test_fields_follow_the_configured_format():
+    log_format = LogFormat('%a %{X-Forwarded-For}i %D "%r" %>s %B')
+
+    assert log_format.fields == ("ip", "x_forwarded_for", "duration_us", "request", "status", "size")
+    row = log_format.parse('::1 192.0.2.7 1500 "GET / HTTP/1.1" 200 512')
+    assert (row["ip"], row["x_forwarded_for"], row["status"], row["size"]) == ("::1", "192.0.2.7", 200, 512)
+
+
+def test_host_names_are_kept_apart_from_addresses():
+    line = '{} - - [10/Oct/2000:13:55:36 -0700] "GET / HTTP/1.1" 200 1 "-" "-"'
+
+    for host, fields in [("2001:db8::1", ("2001:db8::1", None)),
+                         ("crawl-66-249-66-1.googlebot.com", (None, "crawl-66-249-66-1.googlebot.com"))]:
+        row = COMBINED.parse(line.format(host))
+        assert (row["ip"], row["host"]) == fields
+    with pytest.raises(LogFormatError):
+        COMBINED.parse(line.format("2001:zz::1"))
+
+
+def test_unsupported_directive_and_mismatched_line_raise():
+    with pytest.raises(LogFormatError):
+        LogFormat("%h %Z")
+    with pytest.raises(LogFormatError):
+        COMBINED.parse('10.0.0.1 - - [10/Oct/2000:13:55:36 -0700] "GET / HTTP/1.1" 200')
+
+
+def test_timestamps_keep_their_utc_offset():
+    assert decode_timestamp("10/Oct/2000:13:55:36 -0700") == datetime(2000, 10, 10, 20, 55, 36, tzinfo=timezone.utc)
+    assert decode_timestamp("10/Oct/2000:13:55:36 +0530").utcoffset() == timedelta(hours=5, minutes=30)
+    assert decode_timestamp("10/Oct/2000:13:55:36").tzinfo == timezone.utc
+    with pytest.raises(ValueError):
+        decode_timestamp("10/Foo/2000:13:55:36 +0000")
+
+
+def test_repeated_timestamps_are_decoded_once():
+    decode_timestamp.cache_clear()
+    first = decode_timestamp("01/Jan/2024:00:00:00 +0300")
+    again = decode_timestamp("01/Jan/2024:00:00:00 +0300")
+
+    assert again is first
+    info = decode_timestamp.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
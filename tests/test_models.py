@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogEntry, network_range, pack_ip
+from config.database import FastModel
+
+
+def test_network_range_spans_the_whole_block():
+    assert network_range("10.1.2.3/8") == ("10.0.0.0", "10.255.255.255")
+    assert network_range("192.0.2.7") == ("192.0.2.7", "192.0.2.7")
+    assert network_range("2001:db8::/32") == ("2001:db8::", "2001:db8:ffff:ffff:ffff:ffff:ffff:ffff")
+
+
+def test_ipv4_is_packed_as_mapped_ipv6_and_sorts_by_address():
+    assert pack_ip("10.0.0.1") == pack_ip("::ffff:10.0.0.1")
+    assert len(pack_ip("10.0.0.1")) == len(pack_ip("2001:db8::1")) == 16
+    addresses = ["10.0.0.2", "9.255.255.255", "2001:db8::1", "10.0.0.10", "::1"]
+    assert sorted(addresses, key=pack_ip) == ["::1", "9.255.255.255", "10.0.0.2", "10.0.0.10", "2001:db8::1"]
+
+
+def test_network_filter_selects_the_addresses_inside_it():
+    engine = create_engine("sqlite://")
+    FastModel.metadata.create_all(engine)
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as db:
+        for ip in ("9.255.255.255", "10.0.0.1", "10.200.3.4", "11.0.0.0", "2001:db8::1", "2001:db9::1"):
+            db.add(LogEntry(ip=ip, date=date, status=200, size=1))
+        db.commit()
+
+        def between(network):
+            return sorted(entry.ip for entry in db.query(LogEntry).filter(LogEntry.ip.between(*network_range(network))))
+
+        assert between("10.0.0.0/8") == ["10.0.0.1", "10.200.3.4"]
+        assert between("2001:db8::/32") == ["2001:db8::1"]
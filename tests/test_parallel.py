@@ -0,0 +1,34 @@
+import gzip
+
+from apps.logwriter.parallel import read_chunks, split_ranges
+from apps.logwriter.reader import LogFile
+
+LINES = [f"line {number} {'x' * (number % 7)}\n".encode() for number in range(200)]
+DATA = b"".join(LINES)
+
+
+def test_ranges_end_on_newlines_and_cover_the_range(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_bytes(DATA + b"partial")
+    start, end = len(LINES[0]), len(DATA)
+
+    ranges = list(split_ranges(str(path), start, end, 100))
+
+    assert len(ranges) > 1
+    assert ranges[0][0] == start and ranges[-1][1] == end
+    assert all(stop == next_start for (_, stop), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(DATA[stop - 1:stop] == b"\n" for _, stop in ranges)
+
+
+def test_chunks_start_at_their_offsets_and_skip_a_partial_last_line(tmp_path):
+    plain, compressed = tmp_path / "access.log", tmp_path / "access.log.1.gz"
+    plain.write_bytes(DATA + b"partial")
+    compressed.write_bytes(gzip.compress(DATA + b"partial"))
+    offset = sum(map(len, LINES[:10]))
+
+    for path in (plain, compressed):
+        chunks = list(read_chunks(LogFile(str(path), offset), 100))
+
+        assert all(data.endswith(b"\n") for _, data in chunks)
+        assert all(DATA[start:start + len(data)] == data for start, data in chunks)
+        assert b"".join(data for _, data in chunks) == DATA[offset:]
@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogEntry, LogFileCheckpoint, RejectedLogLine
+from apps.logwriter.parser import parse_logs
+from config.database import FastModel
+from config.settings import ApacheConfig
+
+GOOD = '10.0.0.{} - - [10/Oct/2023:13:55:36 +0000] "GET / HTTP/1.1" 200 512 "-" "curl/8.0"\n'
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_malformed_lines_are_quarantined_and_the_rest_is_imported(tmp_path, workers):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    bad = "this is not a log line\n"
+    (logs / "access.log").write_text(GOOD.format(1) + bad + GOOD.format(2) + GOOD.format(3)[:30])
+    settings = ApacheConfig.get_config().model_copy(update={
+        "files_dir": str(logs), "file_extension": ".log", "columnar_dir": None,
+        "log_format": '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"',
+    })
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    FastModel.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        parse_logs(db, settings, workers)
+
+        assert sorted(str(entry.ip) for entry in db.query(LogEntry)) == ["10.0.0.1", "10.0.0.2"]
+        rejected = db.query(RejectedLogLine).one()
+        assert (rejected.line, rejected.offset) == (bad.rstrip("\n"), len(GOOD.format(1)))
+        # the unfinished last line is neither imported nor rejected, but left for the next run
+        assert db.query(LogFileCheckpoint).one().offset == len(GOOD.format(1) + bad + GOOD.format(2))
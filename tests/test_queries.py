@@ -0,0 +1,38 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogEntry
+from apps.logwriter.queries import day_range, filter_log_entries
+from config.database import FastModel
+
+
+def test_day_range_is_half_open_in_utc():
+    start, end = day_range(date(2024, 2, 28), date(2024, 2, 29))
+
+    assert start == datetime(2024, 2, 28, tzinfo=timezone.utc)
+    assert end == datetime(2024, 3, 1, tzinfo=timezone.utc)
+    assert day_range(date(2024, 2, 28)) == (start, start + timedelta(days=1))
+
+
+def test_day_filter_keeps_the_first_instant_and_drops_the_next_midnight():
+    engine = create_engine("sqlite://")
+    FastModel.metadata.create_all(engine)
+    midnight = datetime(2024, 6, 10, tzinfo=timezone.utc)
+    dates = {
+        "before": midnight - timedelta(microseconds=1),
+        "first": midnight,
+        "last": midnight + timedelta(days=1, microseconds=-1),
+        "after": midnight + timedelta(days=1),
+        # 23:30 UTC on the 10th, written with its local offset
+        "offset": datetime(2024, 6, 11, 2, 30, tzinfo=timezone(timedelta(hours=3))),
+    }
+    with Session(engine) as db:
+        for size, moment in enumerate(dates.values()):
+            db.add(LogEntry(ip="10.0.0.1", date=moment, status=200, size=size))
+        db.commit()
+
+        found = filter_log_entries(db.query(LogEntry), date(2024, 6, 10)).all()
+
+        assert sorted(list(dates)[entry.size] for entry in found) == ["first", "last", "offset"]
@@ -0,0 +1,17 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from apps.logwriter.models import LogRequest
+from apps.logwriter.writer import Dictionary
+from config.database import FastModel
+
+
+def test_dictionary_keeps_batch_values_when_the_cache_is_cleared():
+    engine = create_engine("sqlite://")
+    FastModel.metadata.create_all(engine)
+    dictionary = Dictionary(LogRequest, max_size=3)
+    with Session(engine) as db:
+        dictionary.resolve(db, {"GET /a"})
+        ids = dictionary.resolve(db, {"GET /a", "GET /b", "GET /c"})
+        assert {"GET /a", "GET /b", "GET /c"} <= ids.keys()
+        assert ids["GET /a"] != ids["GET /b"]